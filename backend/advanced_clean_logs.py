@@ -5,12 +5,87 @@ Removes duplicates, fixes character doubling, and normalizes text
 for better AI analysis.
 """
 
+import io
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from pathlib import Path
 from typing import List, Dict, Set
 import sys
 
 
+# Read/write buffer for streaming large captures (8 MiB).
+_IO_BUFFER_SIZE = 1 << 23
+
+# Compiled once at import; these run for every line of every log file.
+_ANSI_ESC_LITERAL = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+# Textual escapes left behind by repr(): \x1b[..X, \xHH, \r\n, \r, \n
+_TEXT_ESC = re.compile(r'\\(?:x1b\[[0-9;]*[A-Za-z]|x[0-9a-fA-F]{2}|r\\n|r|n)')
+
+# Single-pass drop of C0 control chars (bell etc.) and CR -> LF.
+# Tab and LF are kept; ESC is dropped after CSI sequences are removed.
+_DEL_TABLE = str.maketrans({
+    **{chr(c): None for c in range(0x20) if chr(c) not in '\t\n\r'},
+    '\r': '\n',
+})
+
+# Router prompts: <R1>, <R1> with trailing text, [R1], R1>, R1#.
+# Matched against stripped text, so no trailing whitespace is allowed for.
+_ROUTER_PROMPT = re.compile(
+    r'^(?:<[^>]+>.*|\[[^\]]+\]|[A-Za-z][A-Za-z0-9\-_]*[>#])$'
+)
+
+
+def _parse_log_line(line: str):
+    r"""Split a stripped '[timestamp] [device] ← content' line into its fields.
+
+    Equivalent to matching r'\[([^\]]+)\]\s*\[([^\]]+)\]\s*([←→])\s*(.+)$'
+    but uses str.find instead of the regex engine. Returns None when the
+    line does not have that shape.
+    """
+    if not line.startswith('['):
+        return None
+    ts_end = line.find(']', 1)
+    if ts_end <= 1:
+        return None
+    rest = line[ts_end + 1:].lstrip()
+    if not rest.startswith('['):
+        return None
+    device_end = rest.find(']', 1)
+    if device_end <= 1:
+        return None
+    body = rest[device_end + 1:].lstrip()
+    if not body or body[0] not in '←→':
+        return None
+    content = body[1:].lstrip()
+    if not content:
+        return None
+    return line[1:ts_end], rest[1:device_end], body[0], content
+
+
+def _iter_lines(fin):
+    """Yield the lines of a binary file, ending lines at CR, LF or CRLF.
+
+    Binary iteration only splits on LF; this restores the universal-newline
+    splitting of text mode so a lone CR still ends a line.
+    """
+    for raw in fin:
+        if b'\r' not in raw:
+            yield raw
+            continue
+        # A CRLF always sits inside one raw line, since raw lines end at LF
+        parts = raw.replace(b'\r\n', b'\n').split(b'\r')
+        if not parts[-1]:
+            parts.pop()
+        yield from parts
+
+
+def _replace_text_escape(match: re.Match) -> str:
+    """Map a textual line-ending escape to a newline and drop everything else."""
+    return '' if match.group()[1] == 'x' else '\n'
+
+
 def clean_and_normalize_text(text: str) -> str:
     """Clean text by removing control characters and normalizing."""
     try:
@@ -27,18 +102,16 @@ def clean_and_normalize_text(text: str) -> str:
     except:
         pass
     
-    # Remove ANSI escape sequences (including \x1b[A type)
-    text = re.sub(r'\\x1b\[[0-9;]*[A-Za-z]', '', text)
-    text = re.sub(r'\x1b\[[0-9;]*[A-Za-z]', '', text)
+    # Remove textual escapes (\x1b[A, \x07, ...) and normalize \r\n / \r / \n
+    text = _TEXT_ESC.sub(_replace_text_escape, text)
     
-    # Remove bell characters and other control chars
-    text = re.sub(r'\\x07', '', text)
-    text = re.sub(r'\x07', '', text)
-    text = re.sub(r'\\x[0-9a-fA-F]{2}', '', text)  # Other hex escapes
+    # Remove real ANSI escape sequences
+    text = _ANSI_ESC_LITERAL.sub('', text)
     
-    # Normalize line endings
-    text = text.replace('\\r\\n', '\n').replace('\\r', '\n').replace('\\n', '\n')
-    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    # Drop control characters and normalize line endings in one pass
+    if '\r' in text:
+        text = text.replace('\r\n', '\n')
+    text = text.translate(_DEL_TABLE)
     
     # Remove leading/trailing whitespace
     text = text.strip()
@@ -51,20 +124,12 @@ def detect_and_fix_doubling(text: str) -> str:
     if not text:
         return text
     
-    # Handle character-by-character doubling (like "ddiissppllaayy")
-    if len(text) >= 4:
-        # Check if every character is doubled
-        if len(text) % 2 == 0:
-            is_char_doubled = True
-            for i in range(0, len(text), 2):
-                if i + 1 >= len(text) or text[i] != text[i + 1]:
-                    is_char_doubled = False
-                    break
-            
-            if is_char_doubled:
-                # Remove doubling
-                result = ''.join(text[i] for i in range(0, len(text), 2))
-                return result
+    # Handle character-by-character doubling (like "ddiissppllaayy"):
+    # every character is doubled iff the even and odd slices are equal.
+    if len(text) >= 4 and len(text) % 2 == 0:
+        even = text[0::2]
+        if even == text[1::2]:
+            return even
     
     # Handle word/phrase doubling
     words = text.split()
@@ -78,14 +143,14 @@ def detect_and_fix_doubling(text: str) -> str:
     # Handle sentence/line doubling
     if len(text) >= 20:  # Only check longer texts
         mid = len(text) // 2
-        # Look for a natural break point near the middle
-        for offset in range(-10, 11):
-            split_pos = mid + offset
-            if 0 < split_pos < len(text):
-                first_part = text[:split_pos].strip()
-                second_part = text[split_pos:].strip()
-                if first_part == second_part and first_part:
-                    return first_part
+        # Exact repetition: one compare of the two halves
+        if len(text) % 2 == 0 and text[:mid] == text[mid:]:
+            return text[:mid]
+        # Halves separated by a single space/char at the midpoint
+        for split_pos in (mid - 1, mid, mid + 1):
+            first_part = text[:split_pos].strip()
+            if first_part and first_part == text[split_pos:].strip():
+                return first_part
     
     return text
 
@@ -95,144 +160,176 @@ def is_meaningful_content(text: str) -> bool:
     if not text:
         return False
     
-    # Remove common whitespace and control characters
-    cleaned = re.sub(r'[\s\r\n\t]+', '', text)
-    return len(cleaned) > 0
+    # str.isspace() uses the same Unicode whitespace table as the \s class,
+    # without building a stripped copy of the line.
+    return not text.isspace()
 
 
 def is_router_prompt(text: str) -> bool:
     """Detect router prompts like <R1>, [R1], R1>, R1#."""
+    # Surrounding whitespace ("R1> ") is stripped before both checks below
     text = text.strip()
     if not text:
         return False
     
-    # Common router prompt patterns
-    patterns = [
-        r'^<[^>]+>$',  # <R1>
-        r'^<[^>]+>.*$',  # <R1> with trailing text
-        r'^\[[^\]]+\]$',  # [R1]
-        r'^[A-Za-z][A-Za-z0-9\-_]*[>#]$',  # R1>, R1#
-        r'^[A-Za-z][A-Za-z0-9\-_]*[>#]\s*$',  # R1> with whitespace
-    ]
-    
-    for pattern in patterns:
-        if re.match(pattern, text):
-            return True
+    # Every prompt form starts with '<' / '[' or ends with '>' / '#', so
+    # most output lines are rejected here without entering the regex engine.
+    if text[0] not in '<[' and text[-1] not in '>#':
+        return False
     
-    return False
+    return _ROUTER_PROMPT.match(text) is not None
 
 
 def clean_log_file_advanced(input_path: Path, output_path: Path = None) -> None:
-    """Advanced cleaning of log files."""
+    """Advanced cleaning of log files.
+
+    The input is streamed line by line and cleaned lines are written as they
+    are produced, so memory use is bounded by the dedup set rather than the
+    file size. Output goes to a temporary sibling first so in-place cleaning
+    (output_path == input_path) never truncates the file being read.
+    """
     if output_path is None:
         output_path = input_path.with_suffix('.clean.log')
     
     print(f"Processing {input_path}")
     
     try:
-        with open(input_path, 'r', encoding='utf-8', errors='replace') as f:
-            content = f.read()
+        fin = open(input_path, 'rb', buffering=_IO_BUFFER_SIZE)
     except Exception as e:
         print(f"Error reading {input_path}: {e}")
         return
     
-    lines = content.split('\n')
-    cleaned_lines = []
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
     seen_lines = set()
     last_prompt = ""
     consecutive_prompt_count = 0
     
-    stats = {
-        'original': len(lines),
-        'empty_removed': 0,
-        'duplicates_removed': 0,
-        'doubled_text_fixed': 0,
-        'prompts_deduplicated': 0,
-    }
+    # Counters are plain locals in the loop and gathered into stats after
+    original = cleaned = empty_removed = duplicates_removed = 0
+    doubled_text_fixed = prompts_deduplicated = 0
     
-    for line_num, line in enumerate(lines, 1):
-        line = line.strip()
-        if not line:
-            stats['empty_removed'] += 1
-            continue
-        
-        # Parse log line format: [timestamp] [device] direction content
-        match = re.match(r'\[([^\]]+)\]\s*\[([^\]]+)\]\s*([←→])\s*(.+)$', line)
-        if not match:
-            # Keep malformed lines as-is for now
-            cleaned_lines.append(line)
-            continue
-        
-        timestamp, device, direction, content = match.groups()
-        
-        # Clean and normalize the content
-        original_content = content
-        cleaned_content = clean_and_normalize_text(content)
-        
-        # Fix character/text doubling
-        undoubled_content = detect_and_fix_doubling(cleaned_content)
-        if undoubled_content != cleaned_content:
-            stats['doubled_text_fixed'] += 1
-            cleaned_content = undoubled_content
-        
-        # Skip if no meaningful content remains
-        if not is_meaningful_content(cleaned_content):
-            stats['empty_removed'] += 1
-            continue
-        
-        # Create a signature for duplicate detection
-        signature = f"{device}|{direction}|{cleaned_content.lower()}"
-        
-        # Handle duplicate prompts specially
-        if is_router_prompt(cleaned_content):
-            if cleaned_content == last_prompt:
-                consecutive_prompt_count += 1
-                if consecutive_prompt_count >= 2:  # Allow max 1 duplicate prompt
-                    stats['prompts_deduplicated'] += 1
-                    continue
-            else:
-                last_prompt = cleaned_content
-                consecutive_prompt_count = 0
-        else:
-            consecutive_prompt_count = 0
-            last_prompt = ""
-        
-        # General duplicate detection
-        if signature in seen_lines:
-            stats['duplicates_removed'] += 1
-            continue
-        
-        seen_lines.add(signature)
-        
-        # Reconstruct the cleaned line
-        cleaned_line = f"[{timestamp}] [{device}] {direction} '{cleaned_content}'"
-        cleaned_lines.append(cleaned_line)
-    
-    # Write the cleaned content
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            for line in cleaned_lines:
-                f.write(line + '\n')
-        
-        stats['cleaned'] = len(cleaned_lines)
-        total_removed = stats['original'] - stats['cleaned']
-        reduction_percent = (total_removed / stats['original'] * 100) if stats['original'] > 0 else 0
-        
-        print(f"  Original lines: {stats['original']}")
-        print(f"  Cleaned lines:  {stats['cleaned']}")
-        print(f"  Reduction:      {reduction_percent:.1f}%")
-        print(f"  - Empty removed: {stats['empty_removed']}")
-        print(f"  - Duplicates removed: {stats['duplicates_removed']}")
-        print(f"  - Doubled text fixed: {stats['doubled_text_fixed']}")
-        print(f"  - Prompts deduplicated: {stats['prompts_deduplicated']}")
-        
-        if output_path != input_path:
-            print(f"  → Cleaned file: {output_path}")
-        else:
-            print(f"  → Updated in place")
+        with fin, open(tmp_path, 'wb', buffering=_IO_BUFFER_SIZE) as fout:
+            for raw in _iter_lines(fin):
+                original += 1
+                line = raw.decode('utf-8', 'replace').strip()
+                if not line:
+                    empty_removed += 1
+                    continue
+                
+                # Parse log line format: [timestamp] [device] direction content
+                fields = _parse_log_line(line)
+                if fields is None:
+                    # Keep malformed lines as-is for now
+                    fout.write(line.encode('utf-8') + b'\n')
+                    cleaned += 1
+                    continue
+                
+                timestamp, device, direction, content = fields
+                
+                # Clean and normalize the content
+                cleaned_content = clean_and_normalize_text(content)
+                
+                # Fix character/text doubling
+                undoubled_content = detect_and_fix_doubling(cleaned_content)
+                if undoubled_content != cleaned_content:
+                    doubled_text_fixed += 1
+                    cleaned_content = undoubled_content
+                
+                # Skip if no meaningful content remains
+                if not is_meaningful_content(cleaned_content):
+                    empty_removed += 1
+                    continue
+                
+                # Create a signature for duplicate detection. Only the 64-bit
+                # tuple hash is retained so the seen set stays small; str
+                # hashes are cached and combined in C, with no formatting or
+                # encoding per line.
+                lowered = cleaned_content.lower()
+                signature = hash((device, direction, lowered))
+                
+                # Handle duplicate prompts specially
+                if is_router_prompt(cleaned_content):
+                    if cleaned_content == last_prompt:
+                        consecutive_prompt_count += 1
+                        if consecutive_prompt_count >= 2:  # Allow max 1 duplicate prompt
+                            prompts_deduplicated += 1
+                            continue
+                    else:
+                        last_prompt = cleaned_content
+                        consecutive_prompt_count = 0
+                else:
+                    consecutive_prompt_count = 0
+                    last_prompt = ""
+                
+                # General duplicate detection
+                if signature in seen_lines:
+                    duplicates_removed += 1
+                    continue
+                
+                seen_lines.add(signature)
+                
+                # Reconstruct the cleaned line
+                cleaned_line = f"[{timestamp}] [{device}] {direction} '{cleaned_content}'"
+                fout.write(cleaned_line.encode('utf-8') + b'\n')
+                cleaned += 1
         
+        os.replace(tmp_path, output_path)
     except Exception as e:
         print(f"Error writing {output_path}: {e}")
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        return
+    
+    stats = {
+        'original': original,
+        'cleaned': cleaned,
+        'empty_removed': empty_removed,
+        'duplicates_removed': duplicates_removed,
+        'doubled_text_fixed': doubled_text_fixed,
+        'prompts_deduplicated': prompts_deduplicated,
+    }
+    total_removed = stats['original'] - stats['cleaned']
+    reduction_percent = (total_removed / stats['original'] * 100) if stats['original'] > 0 else 0
+    
+    print(f"  Original lines: {stats['original']}")
+    print(f"  Cleaned lines:  {stats['cleaned']}")
+    print(f"  Reduction:      {reduction_percent:.1f}%")
+    print(f"  - Empty removed: {stats['empty_removed']}")
+    print(f"  - Duplicates removed: {stats['duplicates_removed']}")
+    print(f"  - Doubled text fixed: {stats['doubled_text_fixed']}")
+    print(f"  - Prompts deduplicated: {stats['prompts_deduplicated']}")
+    
+    if output_path != input_path:
+        print(f"  → Cleaned file: {output_path}")
+    else:
+        print(f"  → Updated in place")
+
+
+def _clean_one(log_file: Path) -> str:
+    """Clean a single file in a worker process and return its printed report."""
+    report = io.StringIO()
+    with redirect_stdout(report):
+        clean_log_file_advanced(log_file, log_file.with_suffix('.clean.log'))
+    return report.getvalue()
+
+
+def _find_log_files(log_dir: Path) -> List[Path]:
+    """Find all .log files in log_dir, skipping .clean.log output.
+
+    scandir yields names and file types from one directory read, so only
+    the files we keep are turned into Path objects. The .log test ignores
+    case, as glob does on Windows where eNSP runs, so *.LOG is found too.
+    """
+    with os.scandir(log_dir) as entries:
+        return [
+            Path(entry.path) for entry in entries
+            if entry.name.lower().endswith('.log')
+            and not entry.name.endswith('.clean.log')
+            and entry.is_file()
+        ]
 
 
 def main():
@@ -241,8 +338,7 @@ def main():
         print(f"Log directory not found: {log_dir}")
         return
     
-    # Find all .log files (but not .clean.log files)
-    log_files = [f for f in log_dir.glob("*.log") if not f.name.endswith('.clean.log')]
+    log_files = _find_log_files(log_dir)
     
     if not log_files:
         print("No log files found")
@@ -251,9 +347,11 @@ def main():
     print(f"Found {len(log_files)} log files to clean")
     print()
     
-    for log_file in log_files:
-        clean_log_file_advanced(log_file, log_file.with_suffix('.clean.log'))
-        print()
+    # Files are independent, so clean them in parallel. Each worker captures
+    # its own report and main prints them in order to avoid interleaving.
+    with ProcessPoolExecutor(max_workers=min(len(log_files), os.cpu_count() or 1)) as executor:
+        for report in executor.map(_clean_one, log_files):
+            print(report)
     
     print("Log cleaning completed!")
     print("\nOriginal files preserved. Clean versions saved with .clean.log extension.")
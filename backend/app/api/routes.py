@@ -17,6 +17,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["api"])
 
+# Errors read, analyzed and stored per page by /reanalyze
+REANALYZE_PAGE_SIZE = 20
+
 
 @router.get("/health")
 async def health_check():
@@ -168,35 +171,50 @@ async def get_stats():
 @router.post("/reanalyze")
 async def reanalyze_errors():
     """Re-analyze all errors that don't have solutions."""
-    # Get all errors without solutions
-    errors_without_solutions = await db.get_errors_without_solutions()
-    
-    if not errors_without_solutions:
-        return {"status": "no_errors", "message": "All errors already have solutions"}
-    
-    logger.info(f"Re-analyzing {len(errors_without_solutions)} errors without solutions")
-    
     analyzed_count = 0
     failed_count = 0
+    total = 0
+    last_id = 0
     
-    for error in errors_without_solutions:
+    # Page through the backlog by error ID; each page is read in full so no
+    # cursor stays open across the LLM calls on the shared connection
+    while True:
+        errors = await db.get_errors_without_solutions_after(last_id, REANALYZE_PAGE_SIZE)
+        if not errors:
+            break
+        last_id = errors[-1].id
+        total += len(errors)
+        
+        solutions = []
+        for error in errors:
+            try:
+                # Analyze with LLM
+                solution = await llm_service.analyze_error(error, "")
+                solution.error_id = error.id
+                solutions.append(solution)
+                logger.info(f"Successfully analyzed error {error.id}")
+                
+            except Exception as e:
+                failed_count += 1
+                logger.error(f"Failed to analyze error {error.id}: {e}")
+        
+        # Store each page in one transaction, so a later failure or a
+        # cancelled request loses at most one page of analyses
         try:
-            # Analyze with LLM
-            solution = await llm_service.analyze_error(error, "")
-            solution.error_id = error.id
-            
-            # Store solution
-            await db.insert_solution(solution)
-            analyzed_count += 1
-            logger.info(f"Successfully analyzed error {error.id}")
-            
+            await db.insert_solutions_bulk(solutions)
+            analyzed_count += len(solutions)
         except Exception as e:
-            failed_count += 1
-            logger.error(f"Failed to analyze error {error.id}: {e}")
+            failed_count += len(solutions)
+            logger.error(f"Failed to store {len(solutions)} solutions: {e}")
+    
+    if not total:
+        return {"status": "no_errors", "message": "All errors already have solutions"}
+    
+    logger.info(f"Re-analyzed {total} errors without solutions")
     
     return {
         "status": "completed",
         "analyzed": analyzed_count,
         "failed": failed_count,
-        "total": len(errors_without_solutions)
+        "total": total
     }
@@ -2,89 +2,92 @@
 import asyncio
 import json
 import logging
-from typing import Set
+import weakref
 from fastapi import WebSocket, WebSocketDisconnect
-from app.models.error import ErrorWithSolution
+from app.models.error import ErrorEvent, ErrorWithSolution
+
+try:
+    import orjson  # type: ignore
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Fields sent in error_update events (context is fetched over REST when needed)
+ERROR_EVENT_FIELDS = {
+    "type": True,
+    "data": {
+        "error": {"id", "device_id", "timestamp", "error_line", "severity", "created_at"},
+        "solution": {"id", "root_cause", "impact", "solution", "prevention"},
+    },
+}
+
+
+def serialize_message(message: dict) -> str:
+    """Serialize a broadcast message once (orjson when installed)."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(message, default=str).decode("utf-8")
+    return json.dumps(message, default=str)
+
 
 class ConnectionManager:
     """Manages WebSocket connections for real-time updates."""
     
     def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
-        self._lock = asyncio.Lock()
+        # Mutated only from the event loop and never across an await, so no
+        # lock is needed. Weak references let abandoned sockets drop out.
+        self.active_connections: "weakref.WeakSet[WebSocket]" = weakref.WeakSet()
     
     async def connect(self, websocket: WebSocket):
         """Accept and store a new WebSocket connection."""
         await websocket.accept()
-        async with self._lock:
-            self.active_connections.add(websocket)
+        self.active_connections.add(websocket)
         logger.info(f"Client connected. Total connections: {len(self.active_connections)}")
     
     async def disconnect(self, websocket: WebSocket):
         """Remove a WebSocket connection."""
-        async with self._lock:
-            self.active_connections.discard(websocket)
+        self.active_connections.discard(websocket)
         logger.info(f"Client disconnected. Total connections: {len(self.active_connections)}")
     
     async def broadcast(self, message: dict):
         """Broadcast a message to all connected clients."""
+        # Serialize once and share the same str across every client. Frames
+        # stay text because the dashboard parses event.data with JSON.parse.
+        await self.broadcast_text(serialize_message(message))
+    
+    async def broadcast_text(self, json_message: str):
+        """Broadcast an already-serialized JSON message to all connected clients."""
         if not self.active_connections:
             logger.debug("No active connections for broadcast")
             return
         
-        # Convert to JSON
-        json_message = json.dumps(message, default=str)
+        # Snapshot so the set can change while sends are in flight
+        connections = tuple(self.active_connections)
         
-        # Send to all connections
-        disconnected = set()
-        success_count = 0
+        results = await asyncio.gather(
+            *(connection.send_text(json_message) for connection in connections),
+            return_exceptions=True
+        )
         
-        async with self._lock:
-            for connection in self.active_connections:
-                try:
-                    await connection.send_text(json_message)
-                    success_count += 1
-                except Exception as e:
-                    logger.warning(f"Failed to send to client: {e}")
-                    disconnected.add(connection)
+        disconnected = set()
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to send to client: {result}")
+                disconnected.add(connection)
+        success_count = len(connections) - len(disconnected)
         
         # Clean up disconnected clients
         if disconnected:
-            async with self._lock:
-                self.active_connections -= disconnected
+            self.active_connections -= disconnected
         
         logger.info(f"Broadcast complete: {success_count} success, {len(disconnected)} failed")
     
     async def broadcast_error(self, error_with_solution: ErrorWithSolution):
         """Broadcast an error update to all clients."""
-        message = {
-            "type": "error_update",
-            "data": {
-                "error": {
-                    "id": error_with_solution.error.id,
-                    "device_id": error_with_solution.error.device_id,
-                    "timestamp": error_with_solution.error.timestamp.isoformat(),
-                    "error_line": error_with_solution.error.error_line,
-                    "severity": error_with_solution.error.severity.value,
-                    "created_at": error_with_solution.error.created_at.isoformat()
-                },
-                "solution": None
-            }
-        }
-        
-        if error_with_solution.solution:
-            message["data"]["solution"] = {
-                "id": error_with_solution.solution.id,
-                "root_cause": error_with_solution.solution.root_cause,
-                "impact": error_with_solution.solution.impact,
-                "solution": error_with_solution.solution.solution,
-                "prevention": error_with_solution.solution.prevention
-            }
-        
-        await self.broadcast(message)
+        event = ErrorEvent(data=error_with_solution)
+        await self.broadcast_text(event.model_dump_json(include=ERROR_EVENT_FIELDS))
     
     @property
     def connection_count(self) -> int:
@@ -1,17 +1,43 @@
 """Configuration management using Pydantic settings."""
 import os
+from functools import lru_cache
 from pathlib import Path
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field, field_validator
 from typing import List
 
+# Working directory at import; relative paths resolve against it
+_CWD = Path.cwd()
+
 try:
     _config_file = os.path.abspath(__file__)
     _config_dir = os.path.dirname(_config_file)
     _backend_dir = os.path.dirname(_config_dir)
     BACKEND_ROOT = Path(_backend_dir)
 except Exception:
-    BACKEND_ROOT = Path.cwd()
+    BACKEND_ROOT = _CWD
+
+# Default error patterns, kept as immutable module constants so Settings
+# builds its list fields from them instead of deep-copying list literals.
+_CRITICAL_PATTERNS = (
+    r"Error:\s*",
+    r"failed",
+    r"failure",
+    r"Unrecognized command",
+    r"Permission denied",
+    r"Interface\s+\S+\s+is\s+down",
+    r"OSPF.*neighbor.*down",
+    r"BGP.*connection.*failed",
+    r"link\s+down",
+)
+
+_WARNING_PATTERNS = (
+    r"Warning:",
+    r"timeout",
+    r"console time out",
+    r"retrying",
+    r"unstable",
+)
 
 
 class Settings(BaseSettings):
@@ -30,10 +56,34 @@ class Settings(BaseSettings):
         default="data/logs",
         description="Directory containing device log files"
     )
+    watcher_use_inotify: bool = Field(
+        default=True,
+        description="On Linux, watch logs with inotify (needs inotify_simple) instead of a watchdog observer"
+    )
     database_url: str = Field(
         default="sqlite:///./data/aiden.db",
         description="Database connection URL"
     )
+    database_journal_mode: str = Field(
+        default="WAL",
+        description="SQLite journal_mode (WAL lets dashboard reads run while errors are written)"
+    )
+    database_synchronous: str = Field(
+        default="NORMAL",
+        description="SQLite synchronous level (NORMAL is safe with WAL and skips an fsync per commit)"
+    )
+    database_cache_size: int = Field(
+        default=-64000,
+        description="SQLite cache_size (negative = KiB, so -64000 is ~64 MB)"
+    )
+    database_mmap_size: int = Field(
+        default=268435456,
+        description="SQLite mmap_size in bytes (0 disables memory-mapped I/O)"
+    )
+    database_busy_timeout_ms: int = Field(
+        default=5000,
+        description="How long SQLite waits on a locked database before failing, in ms"
+    )
     ensp_mode: str = Field(
         default="standard",
         description="ENSP logger mode: standard, extended, lab, or custom"
@@ -76,30 +126,18 @@ class Settings(BaseSettings):
         description="Number of context lines to extract around errors"
     )
     error_patterns_critical: List[str] = Field(
-        default=[
-            r"Error:\s*",
-            r"failed",
-            r"failure",
-            r"Unrecognized command",
-            r"Permission denied",
-            r"Interface\s+\S+\s+is\s+down",
-            r"OSPF.*neighbor.*down",
-            r"BGP.*connection.*failed",
-            r"link\s+down",
-        ],
+        default_factory=lambda: list(_CRITICAL_PATTERNS),
         description="Regex patterns for critical errors"
     )
     
     error_patterns_warning: List[str] = Field(
-        default=[
-            r"Warning:",
-            r"timeout",
-            r"console time out",
-            r"retrying",
-            r"unstable",
-        ],
+        default_factory=lambda: list(_WARNING_PATTERNS),
         description="Regex patterns for warnings"
     )
+    detector_cache_dir: str = Field(
+        default="",
+        description="Directory for cached compiled Hyperscan pattern databases (empty = no caching)"
+    )
     
     host: str = Field(default="0.0.0.0", description="Server host")
     port: int = Field(default=8000, description="Server port")
@@ -124,30 +162,32 @@ class Settings(BaseSettings):
         if BACKEND_ROOT.is_absolute():
             return BACKEND_ROOT / path
         else:
-            return Path.cwd() / BACKEND_ROOT / path
+            return _CWD / BACKEND_ROOT / path
     
-    class Config:
-        env_file = ["../.env", ".env"]
-        env_file_encoding = "utf-8"
-        extra = "ignore"
+    model_config = SettingsConfigDict(
+        env_file=["../.env", ".env"],
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
     
     def get_db_path(self) -> Path:
-        if self.database_url.startswith("sqlite:///"):
-            db_path = self.database_url.replace("sqlite:///", "")
-            path = Path(db_path)
-            if not path.is_absolute():
-                path_str = str(path)
-                if path_str.startswith('./'):
-                    path_str = path_str[2:]
-                return BACKEND_ROOT / path_str
-            return path
-        return BACKEND_ROOT / "data" / "aiden.db"
+        return _resolve_db_path(self.database_url)
 
 
-settings = Settings()
+@lru_cache(maxsize=8)
+def _resolve_db_path(database_url: str) -> Path:
+    """Resolve a database URL to a file path once per distinct URL."""
+    if database_url.startswith("sqlite:///"):
+        db_path = database_url.replace("sqlite:///", "")
+        path = Path(db_path)
+        if not path.is_absolute():
+            path_str = str(path)
+            if path_str.startswith('./'):
+                path_str = path_str[2:]
+            return BACKEND_ROOT / path_str
+        return path
+    return BACKEND_ROOT / "data" / "aiden.db"
 
-settings.log_watch_dir.mkdir(parents=True, exist_ok=True)
-settings.get_db_path().parent.mkdir(parents=True, exist_ok=True)
 
 MODE_CONFIGS = {
     "standard": {
@@ -168,9 +208,41 @@ MODE_CONFIGS = {
     }
 }
 
-if settings.ensp_mode in MODE_CONFIGS:
-    mode_config = MODE_CONFIGS[settings.ensp_mode]
-    if settings.ensp_console_port_range == "2000-2004" and settings.ensp_mode != "standard":
-        settings.ensp_console_port_range = mode_config["port_range"]
-    if settings.ensp_auto_detect == True and settings.ensp_mode == "custom":
-        settings.ensp_auto_detect = mode_config["auto_detect"]
+
+def _ensure_dir(path: Path):
+    """Create a directory unless it already exists (one stat in the common case)."""
+    try:
+        os.stat(path)
+    except FileNotFoundError:
+        path.mkdir(parents=True, exist_ok=True)
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Build the settings on first use and cache them.
+    
+    Applies the ENSP mode defaults and creates the log and database
+    directories if they are missing.
+    """
+    instance = Settings()
+    
+    if instance.ensp_mode in MODE_CONFIGS:
+        mode_config = MODE_CONFIGS[instance.ensp_mode]
+        if instance.ensp_console_port_range == "2000-2004" and instance.ensp_mode != "standard":
+            instance.ensp_console_port_range = mode_config["port_range"]
+        if instance.ensp_auto_detect == True and instance.ensp_mode == "custom":
+            instance.ensp_auto_detect = mode_config["auto_detect"]
+    
+    _ensure_dir(instance.log_watch_dir)
+    _ensure_dir(instance.get_db_path().parent)
+    return instance
+
+
+def __getattr__(name: str):
+    # ``from app.config import settings`` keeps working, but the settings are
+    # only built when first imported by name rather than when config loads.
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
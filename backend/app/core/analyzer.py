@@ -1,8 +1,10 @@
 """Main analyzer that orchestrates error detection and AI analysis."""
 import asyncio
 import logging
+from bisect import bisect_left
+from collections import deque
 from pathlib import Path
-from typing import Callable, List, Optional
+from typing import Callable, List, Optional, Tuple
 from datetime import datetime
 
 from app.core.parser import LogParser
@@ -10,10 +12,13 @@ from app.core.detector import error_detector
 from app.core.extractor import context_extractor
 from app.services.database import db
 from app.services.llm import llm_service
-from app.models.error import DetectedError, Solution, ErrorWithSolution, Severity, LogLine
+from app.models.error import DetectedError, Direction, Solution, ErrorWithSolution, Severity, LogLine
 
 logger = logging.getLogger(__name__)
 
+# Commands kept per file for the command history sent to the LLM
+COMMAND_HISTORY_SIZE = 10
+
 
 class ErrorAnalyzer:
     """
@@ -30,12 +35,18 @@ class ErrorAnalyzer:
     """
     
     def __init__(self):
-        self._broadcast_callbacks: List[Callable] = []
-        self._file_lines_cache: dict = {}  # file_path -> List[LogLine]
+        # (callback, is_coroutine_function), resolved once at registration
+        self._broadcast_callbacks: List[Tuple[Callable, bool]] = []
+        # file_path -> deque of the last lines, enough for the context before an error
+        self._file_lines_cache: dict = {}
+        # file_path -> deque of the last outgoing (command) lines
+        self._file_commands_cache: dict = {}
     
     def register_broadcast(self, callback: Callable):
         """Register a callback to broadcast new errors to clients."""
-        self._broadcast_callbacks.append(callback)
+        self._broadcast_callbacks.append(
+            (callback, asyncio.iscoroutinefunction(callback))
+        )
         logger.info(f"Registered broadcast callback: {callback}")
     
     async def process_new_content(self, file_path: str, new_content: str):
@@ -62,17 +73,11 @@ class ErrorAnalyzer:
         # Deduplicate
         new_lines = LogParser.deduplicate(new_lines)
         
-        # Update cache (append to existing lines)
-        if file_path not in self._file_lines_cache:
-            self._file_lines_cache[file_path] = []
-        self._file_lines_cache[file_path].extend(new_lines)
-        
-        # Keep only last 1000 lines in cache to prevent memory issues
-        if len(self._file_lines_cache[file_path]) > 1000:
-            self._file_lines_cache[file_path] = self._file_lines_cache[file_path][-1000:]
+        # Take the lines of earlier batches this batch needs, then remember its tail
+        earlier_lines, earlier_commands = self._cache_lines(file_path, new_lines)
         
         # Detect errors in new lines
-        errors = error_detector.detect_in_lines(new_lines)
+        errors = await error_detector.detect_in_lines_async(new_lines)
         
         if not errors:
             logger.debug(f"No errors detected in {len(new_lines)} parsed lines")
@@ -80,9 +85,37 @@ class ErrorAnalyzer:
         
         logger.info(f"Detected {len(errors)} errors in parsed lines")
         
-        # Process each error
-        for line, severity, pattern in errors:
-            await self._process_error(file_path, line, severity, pattern)
+        # Process all errors of the batch together
+        await self._process_errors(new_lines, earlier_lines, earlier_commands, errors)
+    
+    def _cache_lines(
+        self,
+        file_path: str,
+        new_lines: List[LogLine]
+    ) -> Tuple[List[LogLine], List[LogLine]]:
+        """
+        Record a batch in the per-file caches.
+        
+        Errors are always in the newest batch, so only the context before
+        the batch (context_lines // 2 lines) and the last few commands are
+        kept from earlier batches; both are bounded deques.
+        
+        Returns:
+            (earlier_lines, earlier_commands) as they were before this batch
+        """
+        lines_cache = self._file_lines_cache.get(file_path)
+        if lines_cache is None:
+            lines_cache = deque(maxlen=context_extractor.context_lines // 2)
+            self._file_lines_cache[file_path] = lines_cache
+        commands_cache = self._file_commands_cache.get(file_path)
+        if commands_cache is None:
+            commands_cache = deque(maxlen=COMMAND_HISTORY_SIZE)
+            self._file_commands_cache[file_path] = commands_cache
+        
+        earlier = (list(lines_cache), list(commands_cache))
+        lines_cache.extend(new_lines)
+        commands_cache.extend(line for line in new_lines if line.direction == Direction.OUT)
+        return earlier
     
     async def _process_raw_content(self, file_path: str, content: str):
         """
@@ -101,85 +134,118 @@ class ErrorAnalyzer:
         
         logger.info(f"Detected {len(errors)} errors in raw content")
         
+        # Raw content has no structure, so every error gets the same tail
+        context = content[-500:] if len(content) > 500 else content
+        prepared = []
         for error_line, severity, pattern in errors:
-            await self._process_raw_error(file_path, error_line, severity, pattern, device_id, content)
+            try:
+                # Create error object with current timestamp
+                prepared.append((DetectedError(
+                    device_id=device_id,
+                    timestamp=datetime.now(),
+                    error_line=error_line,
+                    context=context,
+                    severity=severity,
+                    pattern_matched=pattern
+                ), ""))
+            except Exception as e:
+                logger.error(f"Error processing raw error: {e}", exc_info=True)
+        
+        await self._store_and_broadcast(prepared)
     
-    async def _process_raw_error(
-        self,
-        file_path: str,
-        error_line: str,
-        severity: Severity,
-        pattern: str,
-        device_id: str,
-        full_content: str
-    ):
-        """Process a raw error (unparsed format)."""
-        try:
-            # Create error object with current timestamp
-            detected_error = DetectedError(
-                device_id=device_id,
-                timestamp=datetime.now(),
-                error_line=error_line,
-                context=full_content[-500:] if len(full_content) > 500 else full_content,
-                severity=severity,
-                pattern_matched=pattern
-            )
-            
-            # Store in database
-            error_id = await db.insert_error(detected_error)
-            detected_error.id = error_id
-            
-            logger.info(f"Stored raw error {error_id}: {error_line[:50]}...")
-            
-            # Analyze with LLM (async, non-blocking)
-            asyncio.create_task(
-                self._analyze_and_store(detected_error, "")
-            )
-            
-            # Broadcast immediately (without waiting for AI)
-            await self._broadcast(ErrorWithSolution(error=detected_error, solution=None))
-            
-        except Exception as e:
-            logger.error(f"Error processing raw error: {e}", exc_info=True)
+    @staticmethod
+    def _commands_before(
+        earlier_commands: List[LogLine],
+        new_lines: List[LogLine],
+        command_positions: List[int],
+        position: int
+    ) -> List[LogLine]:
+        """
+        The last COMMAND_HISTORY_SIZE commands before a position in the batch.
+        
+        command_positions lists the batch's outgoing lines in order, so the
+        commands are found by bisection instead of scanning back over
+        the batch for every error.
+        """
+        cut = bisect_left(command_positions, position)
+        recent = [
+            new_lines[i]
+            for i in command_positions[max(0, cut - COMMAND_HISTORY_SIZE):cut]
+        ]
+        if len(recent) < COMMAND_HISTORY_SIZE:
+            recent = earlier_commands[len(recent) - COMMAND_HISTORY_SIZE:] + recent
+        return recent
     
-    async def _process_error(
-        self, 
-        file_path: str, 
-        error_line: LogLine, 
+    def _prepare_error(
+        self,
+        context_lines: List[LogLine],
+        context_index: int,
+        commands: List[LogLine],
         severity: Severity,
         pattern: str
+    ) -> Tuple[DetectedError, str]:
+        """Build a DetectedError and its command history around a known index."""
+        error_line = context_lines[context_index]
+        
+        # Extract context
+        context = context_extractor.extract_from_lines(context_lines, context_index)
+        command_history = context_extractor.get_command_history(
+            commands, len(commands), limit=COMMAND_HISTORY_SIZE
+        )
+        
+        # Create error object
+        detected_error = DetectedError(
+            device_id=error_line.device_id,
+            timestamp=error_line.timestamp,
+            error_line=error_line.content,
+            context=context,
+            severity=severity,
+            pattern_matched=pattern
+        )
+        return detected_error, command_history
+    
+    async def _process_errors(
+        self,
+        new_lines: List[LogLine],
+        earlier_lines: List[LogLine],
+        earlier_commands: List[LogLine],
+        errors: List[Tuple[int, LogLine, Severity, str]]
     ):
-        """Process a single detected error."""
+        """Build context and command history for a batch of errors, then store them together."""
+        context_lines = earlier_lines + new_lines
+        command_positions = [
+            i for i, line in enumerate(new_lines) if line.direction == Direction.OUT
+        ]
+        
+        prepared = []
+        # The detector reports each error's position in the batch
+        for position, line, severity, pattern in errors:
+            try:
+                prepared.append(self._prepare_error(
+                    context_lines, len(earlier_lines) + position,
+                    self._commands_before(earlier_commands, new_lines, command_positions, position),
+                    severity, pattern
+                ))
+            except Exception as e:
+                logger.error(f"Error processing error: {e}", exc_info=True)
+        
+        await self._store_and_broadcast(prepared)
+    
+    async def _store_and_broadcast(self, prepared: List[Tuple[DetectedError, str]]):
+        """Store (error, command_history) pairs in one transaction, then analyze and broadcast each."""
+        if not prepared:
+            return
+        
+        # Store in database
         try:
-            # Get all lines for this file from cache
-            all_lines = self._file_lines_cache.get(file_path, [])
-            
-            # Find error index
-            error_index = len(all_lines) - 1  # Assume it's the most recent
-            for i, line in enumerate(all_lines):
-                if line.timestamp == error_line.timestamp and line.content == error_line.content:
-                    error_index = i
-                    break
-            
-            # Extract context
-            context = context_extractor.extract_from_lines(all_lines, error_index)
-            command_history = context_extractor.get_command_history(all_lines, error_index)
-            
-            # Create error object
-            detected_error = DetectedError(
-                device_id=error_line.device_id,
-                timestamp=error_line.timestamp,
-                error_line=error_line.content,
-                context=context,
-                severity=severity,
-                pattern_matched=pattern
-            )
-            
-            # Store in database
-            error_id = await db.insert_error(detected_error)
+            error_ids = await db.insert_errors_bulk([error for error, _ in prepared])
+        except Exception as e:
+            logger.error(f"Error storing {len(prepared)} errors: {e}", exc_info=True)
+            return
+        
+        for (detected_error, command_history), error_id in zip(prepared, error_ids):
             detected_error.id = error_id
-            
-            logger.info(f"Stored error {error_id}: {error_line.content[:50]}...")
+            logger.info(f"Stored error {error_id}: {detected_error.error_line[:50]}...")
             
             # Analyze with Gemini (async, non-blocking)
             asyncio.create_task(
@@ -189,9 +255,6 @@ class ErrorAnalyzer:
             # Broadcast immediately (without waiting for AI)
             logger.info(f"Broadcasting error {error_id} to {len(self._broadcast_callbacks)} callbacks")
             await self._broadcast(ErrorWithSolution(error=detected_error, solution=None))
-            
-        except Exception as e:
-            logger.error(f"Error processing error: {e}", exc_info=True)
     
     async def _analyze_and_store(self, error: DetectedError, command_history: str):
         """Analyze error with Gemini and store solution."""
@@ -214,22 +277,34 @@ class ErrorAnalyzer:
             logger.error(f"Error analyzing with LLM: {e}", exc_info=True)
     
     async def _broadcast(self, error_with_solution: ErrorWithSolution):
-        """Broadcast to all registered callbacks."""
+        """
+        Broadcast to all registered callbacks concurrently.
+        
+        Async callbacks run as one gather and sync callbacks run in the
+        default executor, so a slow callback does not delay the others.
+        """
         logger.debug(f"Broadcasting to {len(self._broadcast_callbacks)} callbacks")
         
-        for callback in self._broadcast_callbacks:
-            try:
-                if asyncio.iscoroutinefunction(callback):
-                    await callback(error_with_solution)
-                else:
-                    callback(error_with_solution)
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(
+                callback(error_with_solution) if is_coro
+                else loop.run_in_executor(None, callback, error_with_solution)
+                for callback, is_coro in self._broadcast_callbacks
+            ),
+            return_exceptions=True,
+        )
+        
+        for (callback, _), result in zip(self._broadcast_callbacks, results):
+            if isinstance(result, Exception):
+                logger.error(f"Broadcast callback error: {result}")
+            else:
                 logger.debug(f"Broadcast successful to {callback}")
-            except Exception as e:
-                logger.error(f"Broadcast callback error: {e}")
     
     def clear_cache(self):
         """Clear the line cache."""
         self._file_lines_cache.clear()
+        self._file_commands_cache.clear()
 
 
 # Global analyzer instance
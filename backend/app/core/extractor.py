@@ -1,9 +1,10 @@
 """Context extraction for error analysis."""
+from itertools import islice
 from pathlib import Path
 from typing import List, Optional
 from datetime import datetime
 from app.config import settings
-from app.models.error import LogLine
+from app.models.error import Direction, LogLine
 from app.core.parser import LogParser
 
 
@@ -70,18 +71,18 @@ class ContextExtractor:
         before = before if before is not None else self.context_lines // 2
         after = after if after is not None else self.context_lines // 2
         
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                all_lines = f.readlines()
-        except Exception as e:
-            return f"Error reading file: {e}"
-        
         # Convert to 0-indexed
         error_index = error_line_num - 1
         start = max(0, error_index - before)
-        end = min(len(all_lines), error_index + after + 1)
+        end = max(start, error_index + after + 1)
         
-        raw_lines = all_lines[start:end]
+        # Read only up to the window instead of the whole file; islice
+        # stops at end of file when the window runs past it
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                raw_lines = list(islice(f, start, end))
+        except Exception as e:
+            return f"Error reading file: {e}"
         
         # Parse lines
         parsed_lines = []
@@ -149,9 +150,10 @@ class ContextExtractor:
         result = []
         for i, line in enumerate(lines):
             marker = ">>> " if i == error_offset else "    "
-            direction = "<-" if line.direction == "in" else "->"
-            formatted = f"{marker}[{line.timestamp.strftime('%H:%M:%S')}] {direction} {line.content}"
-            result.append(formatted)
+            direction = "<-" if line.direction == Direction.IN else "->"
+            # time().isoformat() gives HH:MM:SS several times faster than strftime
+            clock = line.timestamp.time().isoformat("seconds")
+            result.append(f"{marker}[{clock}] {direction} {line.content}")
         
         return '\n'.join(result)
     
@@ -174,7 +176,7 @@ class ContextExtractor:
         """
         commands = []
         for i in range(error_index - 1, -1, -1):
-            if lines[i].direction == "out":
+            if lines[i].direction == Direction.OUT:
                 commands.append(lines[i].content)
                 if len(commands) >= limit:
                     break
@@ -2,12 +2,31 @@
 import re
 import logging
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional, List
-from app.models.error import LogLine
+from app.models.error import Direction, LogLine
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1024)
+def parse_timestamp(timestamp_str: str) -> datetime:
+    """
+    Parse a 'YYYY-MM-DD HH:MM:SS' timestamp.
+    
+    fromisoformat is implemented in C and much faster than strptime; the
+    cache serves the runs of same-second lines in bursty captures. Unusual
+    spacing between date and time falls back to strptime.
+    
+    Raises:
+        ValueError: If the string is not a valid timestamp
+    """
+    try:
+        return datetime.fromisoformat(timestamp_str)
+    except ValueError:
+        return datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
+
+
 class LogParser:
     """Parser for Huawei ENSP telnet log format with flexible fallback."""
     
@@ -27,9 +46,17 @@ class LogParser:
         r"(\d{4}-\d{2}-\d{2}[\sT]\d{2}:\d{2}:\d{2})"
     )
     
-    # ANSI escape sequences and control characters
-    ESCAPE_PATTERN = re.compile(r'\x1b\[[0-9;]*[a-zA-Z]')
-    CONTROL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+    # Device name mentioned in free-form lines, tried in order
+    DEVICE_PATTERNS = (
+        re.compile(r'\[([\w-]+)\]'),              # [DeviceName] or [Device-1]
+        re.compile(r'<([\w-]+)>'),                # <DeviceName> or <Device-1>
+        re.compile(r'^([A-Za-z][\w-]*)(?=[>#])'),  # DeviceName> or DeviceName# (at start of line)
+    )
+    
+    # ANSI escape sequences or single control characters, removed in one pass.
+    # Control characters are matched one at a time so an ESC starting an
+    # escape sequence is never swallowed by a preceding run of controls.
+    CLEAN_PATTERN = re.compile(r'\x1b\[[0-9;]*[a-zA-Z]|[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
     
     @classmethod
     def parse_line(cls, raw: str) -> Optional[LogLine]:
@@ -45,15 +72,19 @@ class LogParser:
         stripped = raw.strip()
         if not stripped:
             return None
-        
+        return cls._parse_stripped(stripped, raw)
+    
+    @classmethod
+    def _parse_stripped(cls, stripped: str, raw: str) -> Optional[LogLine]:
+        """Parse a line that is already stripped and known to be non-empty."""
         # Try standard format first
         match = cls.LOG_LINE_PATTERN.match(stripped)
         if match:
             timestamp_str, device_id, direction, content = match.groups()
             return LogLine(
-                timestamp=datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S"),
+                timestamp=parse_timestamp(timestamp_str),
                 device_id=device_id,
-                direction="in" if direction == "←" else "out",
+                direction=Direction.IN if direction == "←" else Direction.OUT,
                 content=cls.clean_content(content),
                 raw=raw
             )
@@ -63,9 +94,9 @@ class LogParser:
         if match:
             timestamp_str, device_id, content = match.groups()
             return LogLine(
-                timestamp=datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S"),
+                timestamp=parse_timestamp(timestamp_str),
                 device_id=device_id,
-                direction="in",  # Assume incoming for simplified format
+                direction=Direction.IN,  # Assume incoming for simplified format
                 content=cls.clean_content(content),
                 raw=raw
             )
@@ -88,18 +119,13 @@ class LogParser:
         if ts_match:
             try:
                 ts_str = ts_match.group(1).replace('T', ' ')
-                timestamp = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
+                timestamp = parse_timestamp(ts_str)
             except ValueError:
                 pass
         
         # Extract device from content if mentioned (e.g., "Router1:", "R1>", etc.)
-        device_patterns = [
-            r'\[([\w-]+)\]',              # [DeviceName] or [Device-1]
-            r'<([\w-]+)>',                # <DeviceName> or <Device-1>
-            r'^([A-Za-z][\w-]*)(?=[>#])',  # DeviceName> or DeviceName# (at start of line)
-        ]
-        for pattern in device_patterns:
-            dev_match = re.search(pattern, stripped)
+        for pattern in cls.DEVICE_PATTERNS:
+            dev_match = pattern.search(stripped)
             if dev_match:
                 device_id = dev_match.group(1)
                 break
@@ -107,7 +133,7 @@ class LogParser:
         return LogLine(
             timestamp=timestamp,
             device_id=device_id,
-            direction="in",
+            direction=Direction.IN,
             content=cls.clean_content(stripped),
             raw=raw
         )
@@ -123,14 +149,10 @@ class LogParser:
         Returns:
             Cleaned content string
         """
-        # Remove ANSI escape sequences
-        cleaned = cls.ESCAPE_PATTERN.sub('', content)
-        
-        # Remove control characters (but keep newlines for multi-line content)
-        cleaned = cls.CONTROL_CHARS.sub('', cleaned)
-        
-        # Remove trailing \r
-        cleaned = cleaned.rstrip('\r')
+        # Remove ANSI escape sequences and control characters (but keep
+        # newlines for multi-line content). Printable text has neither, and
+        # isprintable() rejects it without entering the regex engine.
+        cleaned = content if content.isprintable() else cls.CLEAN_PATTERN.sub('', content)
         
         # Note: echo-double removal is handled at write time by SessionLogger._clean_console_text.
         # Applying it again here would risk corrupting valid content with repeated characters.
@@ -151,9 +173,12 @@ class LogParser:
             List of parsed LogLine objects
         """
         lines = []
+        parse = cls._parse_stripped
         for raw_line in content.split('\n'):
-            if raw_line.strip():
-                parsed = cls.parse_line(raw_line)
+            # Strip once here rather than again in parse_line
+            stripped = raw_line.strip()
+            if stripped:
+                parsed = parse(stripped, raw_line)
                 if parsed:
                     lines.append(parsed)
         
@@ -204,7 +229,7 @@ class LogParser:
         """
         commands = []
         for line in reversed(lines):
-            if line.direction == "out" and line.content:
+            if line.direction == Direction.OUT and line.content:
                 commands.append(line.content)
                 if len(commands) >= limit:
                     break
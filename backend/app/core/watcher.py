@@ -1,6 +1,7 @@
 """File watcher service using watchdog for real-time log monitoring."""
 import asyncio
 import platform
+import sys
 from pathlib import Path
 from typing import Callable, Dict, Optional, List
 from watchdog.observers import Observer
@@ -11,10 +12,19 @@ import logging
 
 from app.config import settings
 
+try:
+    from inotify_simple import INotify, flags as inotify_flags  # type: ignore
+    INOTIFY_AVAILABLE = True
+except ImportError:
+    INotify = None
+    inotify_flags = None
+    INOTIFY_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 # Use polling on Windows for better reliability
 IS_WINDOWS = platform.system() == 'Windows'
+IS_LINUX = sys.platform.startswith('linux')
 
 
 class LogFileHandler(FileSystemEventHandler):
@@ -30,6 +40,8 @@ class LogFileHandler(FileSystemEventHandler):
         super().__init__()
         self._callback = callback
         self._file_positions: Dict[str, int] = {}
+        # Trailing partial line of each file, held until its newline arrives
+        self._file_tails: Dict[str, bytes] = {}
         self._lock = threading.Lock()
     
     def on_created(self, event):
@@ -59,31 +71,39 @@ class LogFileHandler(FileSystemEventHandler):
         return path.suffix in ('', '.log', '.txt') and not path.name.startswith('.')
     
     def _read_new_content(self, file_path: str) -> str:
-        """Read only new content since last read."""
+        """
+        Read only new complete lines since last read.
+        
+        A partial last line (the writer is mid-line) is kept as bytes and
+        prepended to the next read, so each line reaches the parser once
+        and whole, and a multi-byte character split across writes is
+        decoded intact.
+        """
         with self._lock:
             try:
-                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                    # Get current position
-                    current_pos = self._file_positions.get(file_path, 0)
-                    
+                with open(file_path, 'rb') as f:
                     # Seek to last position
-                    f.seek(current_pos)
+                    f.seek(self._file_positions.get(file_path, 0))
                     
                     # Read new content
-                    new_content = f.read()
+                    data = self._file_tails.pop(file_path, b"") + f.read()
                     
                     # Update position
                     self._file_positions[file_path] = f.tell()
-                    
-                    return new_content
             except Exception as e:
                 logger.error(f"Error reading file {file_path}: {e}")
                 return ""
+            
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                self._file_tails[file_path] = data[end:]
+            return data[:end].decode("utf-8", errors="replace")
     
     def reset_position(self, file_path: str):
         """Reset file position to start tracking from beginning."""
         with self._lock:
             self._file_positions[file_path] = 0
+            self._file_tails.pop(file_path, None)
     
     def get_tracked_files(self) -> List[str]:
         """Get list of currently tracked files."""
@@ -116,6 +136,7 @@ class LogWatcher:
         self._callbacks: List[Callable[[str, str], None]] = []
         self._async_callbacks: List[Callable[[str, str], asyncio.coroutine]] = []
         self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inotify = None
     
     def register_callback(self, callback: Callable[[str, str], None]):
         """
@@ -144,20 +165,30 @@ class LogWatcher:
             except Exception as e:
                 logger.error(f"Callback error: {e}")
         
-        # Async callbacks - schedule on event loop
+        # Async callbacks - one hand-off to the event loop runs them all
         if self._loop and self._async_callbacks:
-            for callback in self._async_callbacks:
-                try:
-                    asyncio.run_coroutine_threadsafe(
-                        callback(file_path, new_content),
-                        self._loop
-                    )
-                except Exception as e:
-                    logger.error(f"Async callback error: {e}")
+            try:
+                asyncio.run_coroutine_threadsafe(
+                    self._run_async_callbacks(file_path, new_content),
+                    self._loop
+                )
+            except Exception as e:
+                logger.error(f"Async callback error: {e}")
+    
+    async def _run_async_callbacks(self, file_path: str, new_content: str):
+        """Run every async callback concurrently and log the ones that fail."""
+        callbacks = list(self._async_callbacks)
+        results = await asyncio.gather(
+            *(callback(file_path, new_content) for callback in callbacks),
+            return_exceptions=True,
+        )
+        for callback, result in zip(callbacks, results):
+            if isinstance(result, Exception):
+                logger.error(f"Async callback error in {callback}: {result}")
     
     def start(self):
         """Start watching the log directory."""
-        if self._observer is not None:
+        if self._observer is not None or self._inotify is not None:
             logger.warning("Watcher already running")
             return
         
@@ -167,30 +198,71 @@ class LogWatcher:
         # Create handler
         self._handler = LogFileHandler(self._dispatch_callbacks)
         
-        # Use PollingObserver on Windows for better reliability
-        # Native Windows filesystem events can miss some changes
-        if IS_WINDOWS:
-            self._observer = PollingObserver(timeout=1)
-            logger.info("Using PollingObserver for Windows compatibility")
-        else:
-            self._observer = Observer()
-        
-        self._observer.schedule(self._handler, str(self.watch_dir), recursive=False)
-        
         # Try to get current event loop for async callbacks
         try:
             self._loop = asyncio.get_running_loop()
         except RuntimeError:
             self._loop = None
         
-        self._observer.start()
+        # On Linux, watch with inotify from the event loop itself: one fd,
+        # no observer thread. Needs a running loop to register the reader.
+        if (settings.watcher_use_inotify and IS_LINUX and INOTIFY_AVAILABLE
+                and self._loop is not None):
+            self._start_inotify()
+        else:
+            # Use PollingObserver on Windows for better reliability
+            # Native Windows filesystem events can miss some changes
+            if IS_WINDOWS:
+                self._observer = PollingObserver(timeout=1)
+                logger.info("Using PollingObserver for Windows compatibility")
+            else:
+                self._observer = Observer()
+            
+            self._observer.schedule(self._handler, str(self.watch_dir), recursive=False)
+            self._observer.start()
         logger.info(f"Started watching directory: {self.watch_dir}")
         
         # Scan existing files on startup
         self._scan_existing_files()
     
+    def _start_inotify(self):
+        """Watch the directory with inotify, read on the event loop."""
+        self._inotify = INotify()
+        self._inotify.add_watch(
+            str(self.watch_dir),
+            inotify_flags.MODIFY | inotify_flags.CREATE | inotify_flags.MOVED_TO
+        )
+        self._loop.add_reader(self._inotify.fileno(), self._drain_inotify)
+        logger.info("Using inotify for file watching")
+    
+    def _drain_inotify(self):
+        """Read pending inotify events and dispatch new content once per file."""
+        try:
+            events = self._inotify.read(timeout=0)
+        except Exception as e:
+            logger.error(f"Error reading inotify events: {e}")
+            return
+        
+        # Several writes to a file arrive as several events; read it once
+        names = dict.fromkeys(
+            event.name for event in events
+            if event.name and not event.mask & inotify_flags.ISDIR
+        )
+        for name in names:
+            file_path = str(self.watch_dir / name)
+            if self._handler._is_log_file(file_path):
+                new_content = self._handler._read_new_content(file_path)
+                if new_content:
+                    self._dispatch_callbacks(file_path, new_content)
+    
     def stop(self):
         """Stop watching the log directory."""
+        if self._inotify is not None:
+            self._loop.remove_reader(self._inotify.fileno())
+            self._inotify.close()
+            self._inotify = None
+            self._handler = None
+            logger.info("Stopped watching directory")
         if self._observer is not None:
             self._observer.stop()
             self._observer.join(timeout=5)
@@ -221,6 +293,8 @@ class LogWatcher:
     @property
     def is_running(self) -> bool:
         """Check if watcher is currently running."""
+        if self._inotify is not None:
+            return True
         return self._observer is not None and self._observer.is_alive()
 
 
@@ -1,7 +1,8 @@
 """Error and solution data models."""
+from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
-from typing import Optional, List
+from typing import Literal, Optional, List
 from pydantic import BaseModel, Field
 
 
@@ -13,11 +14,30 @@ class Severity(str, Enum):
     INFO = "info"
 
 
-class LogLine(BaseModel):
-    """Parsed log line structure."""
+class Direction(str, Enum):
+    """
+    Traffic direction of a log line.
+    
+    A str Enum, so members equal their plain values: filters compare with
+    ``==`` and a LogLine built with ``"out"`` still counts as a command.
+    """
+    IN = "in"    # from the device
+    OUT = "out"  # to the device (commands)
+
+
+@dataclass(slots=True)
+class LogLine:
+    """
+    Parsed log line structure.
+    
+    A slotted dataclass rather than a Pydantic model: lines are internal to
+    the pipeline (never sent to clients), are built by the parser with
+    already-correct types, and are created for every line read, so they
+    skip validation and the per-instance __dict__.
+    """
     timestamp: datetime
     device_id: str
-    direction: str  # 'in' or 'out'
+    direction: Direction
     content: str
     raw: str = ""
 
@@ -51,6 +71,12 @@ class ErrorWithSolution(BaseModel):
     solution: Optional[Solution] = None
 
 
+class ErrorEvent(BaseModel):
+    """WebSocket envelope for a new error or an added solution."""
+    type: Literal["error_update"] = "error_update"
+    data: ErrorWithSolution
+
+
 class ErrorListResponse(BaseModel):
     """Paginated list of errors."""
     errors: List[ErrorWithSolution]
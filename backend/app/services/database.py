@@ -1,29 +1,92 @@
 """Database service for storing errors and solutions."""
+import asyncio
 import aiosqlite
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
-from datetime import datetime
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta, timezone
 
 from app.config import settings
 from app.models.error import DetectedError, Solution, Severity, ErrorWithSolution
 
 
+# Timestamps are stored as INTEGER milliseconds since 1970-01-01, taking
+# naive datetimes as they are (no local-time conversion) so they round-trip.
+EPOCH = datetime(1970, 1, 1)
+ONE_MS = timedelta(milliseconds=1)
+
+# SQL for the current UTC time in epoch ms, matching what CURRENT_TIMESTAMP
+# used to record for created_at
+NOW_MS_SQL = "CAST(ROUND((julianday('now') - 2440587.5) * 86400000) AS INTEGER)"
+
+# Statements are built once so every call hands sqlite3 the same string
+# and hits its prepared-statement cache
+INSERT_ERROR_SQL = f"""
+    INSERT INTO errors (device_id, timestamp, error_line, context, severity, pattern_matched, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, {NOW_MS_SQL})
+"""
+INSERT_SOLUTION_SQL = f"""
+    INSERT INTO solutions (error_id, root_cause, impact, solution, prevention, created_at)
+    VALUES (?, ?, ?, ?, ?, {NOW_MS_SQL})
+"""
+
+# PRAGMA user_version of an up-to-date database; see Database._migrate
+SCHEMA_VERSION = 2
+
+
+def _to_epoch_ms(value: datetime) -> int:
+    """Convert a datetime to stored epoch milliseconds."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // ONE_MS
+
+
+@lru_cache(maxsize=1024)
+def _from_epoch_ms(value: int) -> datetime:
+    """
+    Convert stored epoch milliseconds back to a naive datetime, memoized.
+    
+    Timestamps cluster at second resolution, so rows on a page share most
+    of their values and repeated conversions become cache hits.
+    """
+    return EPOCH + value * ONE_MS
+
+
 class Database:
     """Async SQLite database service."""
     
     def __init__(self, db_path: Optional[Path] = None):
         self.db_path = db_path or settings.get_db_path()
         self._connection: Optional[aiosqlite.Connection] = None
+        # Inserts share one connection, so last_insert_rowid() is only
+        # meaningful while no other insert can run; see insert_errors_bulk
+        self._insert_lock = asyncio.Lock()
     
     async def connect(self):
         """Initialize database connection and create tables."""
         self._connection = await aiosqlite.connect(self.db_path)
         self._connection.row_factory = aiosqlite.Row
+        await self._configure()
         await self._create_tables()
     
+    async def _configure(self):
+        """Apply the connection PRAGMAs from settings before any table access."""
+        for pragma in (
+            f"journal_mode={settings.database_journal_mode}",
+            f"synchronous={settings.database_synchronous}",
+            "temp_store=MEMORY",
+            f"cache_size={int(settings.database_cache_size)}",
+            f"mmap_size={int(settings.database_mmap_size)}",
+            f"busy_timeout={int(settings.database_busy_timeout_ms)}",
+        ):
+            await self._connection.execute(f"PRAGMA {pragma}")
+    
     async def close(self):
         """Close database connection."""
         if self._connection:
+            # Refresh planner statistics for tables this connection queried,
+            # once they have data worth analyzing
+            await self._connection.execute("PRAGMA optimize")
             await self._connection.close()
             self._connection = None
     
@@ -33,13 +96,13 @@ class Database:
             CREATE TABLE IF NOT EXISTS errors (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 device_id TEXT NOT NULL,
-                timestamp DATETIME NOT NULL,
+                timestamp INTEGER NOT NULL,
                 error_line TEXT NOT NULL,
                 context TEXT NOT NULL,
                 severity TEXT NOT NULL,
                 pattern_matched TEXT,
                 dismissed INTEGER DEFAULT 0,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                created_at INTEGER
             );
             
             CREATE TABLE IF NOT EXISTS solutions (
@@ -49,58 +112,185 @@ class Database:
                 impact TEXT NOT NULL,
                 solution TEXT NOT NULL,
                 prevention TEXT NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                created_at INTEGER
             );
             
             CREATE INDEX IF NOT EXISTS idx_errors_device ON errors(device_id);
             CREATE INDEX IF NOT EXISTS idx_errors_timestamp ON errors(timestamp);
             CREATE INDEX IF NOT EXISTS idx_solutions_error ON solutions(error_id);
         """)
-        # Add dismissed column if it doesn't exist (for existing databases)
-        try:
-            await self._connection.execute("ALTER TABLE errors ADD COLUMN dismissed INTEGER DEFAULT 0")
-            await self._connection.commit()
-        except Exception:
-            pass  # Column already exists
+        cursor = await self._connection.execute("PRAGMA user_version")
+        version = (await cursor.fetchone())[0]
+        if version < SCHEMA_VERSION:
+            await self._migrate(version)
+        # Composite indexes serve the dashboard and filtered listings straight
+        # off the index in created_at order, with no scan or sort
+        await self._connection.executescript("""
+            CREATE INDEX IF NOT EXISTS idx_errors_active
+                ON errors(dismissed, created_at DESC);
+            CREATE INDEX IF NOT EXISTS idx_errors_dev_sev_created
+                ON errors(device_id, severity, created_at DESC);
+        """)
+        await self._connection.commit()
+    
+    async def _migrate(self, version: int):
+        """Bring a database at schema `version` up to SCHEMA_VERSION."""
+        if version < 1:
+            # Add dismissed column if it doesn't exist (for existing databases)
+            cursor = await self._connection.execute("PRAGMA table_info(errors)")
+            if "dismissed" not in {row["name"] for row in await cursor.fetchall()}:
+                await self._connection.execute("ALTER TABLE errors ADD COLUMN dismissed INTEGER DEFAULT 0")
+        if version < 2:
+            # Convert ISO text timestamps from older databases to epoch ms
+            for table, columns in (("errors", ("timestamp", "created_at")), ("solutions", ("created_at",))):
+                for column in columns:
+                    await self._connection.execute(
+                        f"""
+                        UPDATE {table}
+                        SET {column} = COALESCE(
+                            CAST(ROUND((julianday({column}) - 2440587.5) * 86400000) AS INTEGER),
+                            {column}
+                        )
+                        WHERE typeof({column}) = 'text'
+                        """
+                    )
+        await self._connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         await self._connection.commit()
     
     async def insert_error(self, error: DetectedError) -> int:
         """Insert a detected error and return its ID."""
-        cursor = await self._connection.execute(
-            """
-            INSERT INTO errors (device_id, timestamp, error_line, context, severity, pattern_matched)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (
-                error.device_id,
-                error.timestamp.isoformat(),
-                error.error_line,
-                error.context,
-                error.severity.value,
-                error.pattern_matched
+        async with self._insert_lock:
+            cursor = await self._connection.execute(
+                INSERT_ERROR_SQL,
+                (
+                    error.device_id,
+                    _to_epoch_ms(error.timestamp),
+                    error.error_line,
+                    error.context,
+                    error.severity.value,
+                    error.pattern_matched
+                )
             )
-        )
-        await self._connection.commit()
+            await self._connection.commit()
         return cursor.lastrowid
     
+    async def insert_errors_bulk(self, errors: List[DetectedError]) -> List[int]:
+        """Insert several detected errors in one transaction and return their IDs."""
+        if not errors:
+            return []
+        # executemany does not set lastrowid; rows from one statement on one
+        # connection get consecutive AUTOINCREMENT ids ending at the last one.
+        # The lock keeps any other insert from moving last_insert_rowid()
+        # between the statement and the read.
+        async with self._insert_lock:
+            await self._connection.executemany(
+                INSERT_ERROR_SQL,
+                [
+                    (
+                        error.device_id,
+                        _to_epoch_ms(error.timestamp),
+                        error.error_line,
+                        error.context,
+                        error.severity.value,
+                        error.pattern_matched
+                    )
+                    for error in errors
+                ]
+            )
+            cursor = await self._connection.execute("SELECT last_insert_rowid()")
+            last_id = (await cursor.fetchone())[0]
+            await self._connection.commit()
+        return list(range(last_id - len(errors) + 1, last_id + 1))
+    
     async def insert_solution(self, solution: Solution) -> int:
         """Insert an AI-generated solution and return its ID."""
-        cursor = await self._connection.execute(
-            """
-            INSERT INTO solutions (error_id, root_cause, impact, solution, prevention)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (
-                solution.error_id,
-                solution.root_cause,
-                solution.impact,
-                solution.solution,
-                solution.prevention
+        async with self._insert_lock:
+            cursor = await self._connection.execute(
+                INSERT_SOLUTION_SQL,
+                (
+                    solution.error_id,
+                    solution.root_cause,
+                    solution.impact,
+                    solution.solution,
+                    solution.prevention
+                )
             )
-        )
-        await self._connection.commit()
+            await self._connection.commit()
         return cursor.lastrowid
     
+    async def insert_solutions_bulk(self, solutions: List[Solution]) -> List[int]:
+        """Insert several solutions in one transaction and return their IDs."""
+        if not solutions:
+            return []
+        # Same consecutive-id reasoning as insert_errors_bulk
+        async with self._insert_lock:
+            await self._connection.executemany(
+                INSERT_SOLUTION_SQL,
+                [
+                    (
+                        solution.error_id,
+                        solution.root_cause,
+                        solution.impact,
+                        solution.solution,
+                        solution.prevention
+                    )
+                    for solution in solutions
+                ]
+            )
+            cursor = await self._connection.execute("SELECT last_insert_rowid()")
+            last_id = (await cursor.fetchone())[0]
+            await self._connection.commit()
+        return list(range(last_id - len(solutions) + 1, last_id + 1))
+    
+    @staticmethod
+    def _row_to_error(row) -> DetectedError:
+        """Build a DetectedError from an errors row."""
+        return DetectedError(
+            id=row["id"],
+            device_id=row["device_id"],
+            timestamp=_from_epoch_ms(row["timestamp"]),
+            error_line=row["error_line"],
+            context=row["context"],
+            severity=Severity(row["severity"]),
+            pattern_matched=row["pattern_matched"] or "",
+            created_at=_from_epoch_ms(row["created_at"])
+        )
+    
+    async def _with_solutions(self, rows) -> List[ErrorWithSolution]:
+        """
+        Pair error rows with their solutions.
+        
+        Solutions are fetched in one narrow query for just these errors
+        instead of joining every error row against the solutions table.
+        When an error was analyzed more than once, the newest solution wins.
+        """
+        errors = [self._row_to_error(row) for row in rows]
+        solutions: Dict[int, Solution] = {}
+        if errors:
+            placeholders = ",".join("?" * len(errors))
+            cursor = await self._connection.execute(
+                f"""
+                SELECT * FROM solutions
+                WHERE error_id IN ({placeholders})
+                ORDER BY id
+                """,
+                [error.id for error in errors]
+            )
+            for row in await cursor.fetchall():
+                solutions[row["error_id"]] = Solution(
+                    id=row["id"],
+                    error_id=row["error_id"],
+                    root_cause=row["root_cause"],
+                    impact=row["impact"],
+                    solution=row["solution"],
+                    prevention=row["prevention"],
+                    created_at=_from_epoch_ms(row["created_at"])
+                )
+        return [
+            ErrorWithSolution(error=error, solution=solutions.get(error.id))
+            for error in errors
+        ]
+    
     async def get_errors(
         self, 
         page: int = 1, 
@@ -114,17 +304,17 @@ class Database:
         params = []
         
         if device_id:
-            where_clauses.append("e.device_id = ?")
+            where_clauses.append("device_id = ?")
             params.append(device_id)
         if severity:
-            where_clauses.append("e.severity = ?")
+            where_clauses.append("severity = ?")
             params.append(severity.value)
         
         where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
         
         # Get total count
         count_cursor = await self._connection.execute(
-            f"SELECT COUNT(*) FROM errors e WHERE {where_sql}",
+            f"SELECT COUNT(*) FROM errors WHERE {where_sql}",
             params
         )
         total = (await count_cursor.fetchone())[0]
@@ -133,56 +323,20 @@ class Database:
         offset = (page - 1) * per_page
         cursor = await self._connection.execute(
             f"""
-            SELECT e.*, s.id as sol_id, s.root_cause, s.impact, s.solution, s.prevention, s.created_at as sol_created_at
-            FROM errors e
-            LEFT JOIN solutions s ON e.id = s.error_id
+            SELECT * FROM errors
             WHERE {where_sql}
-            ORDER BY e.created_at DESC
+            ORDER BY created_at DESC
             LIMIT ? OFFSET ?
             """,
             params + [per_page, offset]
         )
         
-        rows = await cursor.fetchall()
-        results = []
-        
-        for row in rows:
-            error = DetectedError(
-                id=row["id"],
-                device_id=row["device_id"],
-                timestamp=datetime.fromisoformat(row["timestamp"]),
-                error_line=row["error_line"],
-                context=row["context"],
-                severity=Severity(row["severity"]),
-                pattern_matched=row["pattern_matched"] or "",
-                created_at=datetime.fromisoformat(row["created_at"])
-            )
-            
-            solution = None
-            if row["sol_id"]:
-                solution = Solution(
-                    id=row["sol_id"],
-                    error_id=row["id"],
-                    root_cause=row["root_cause"],
-                    impact=row["impact"],
-                    solution=row["solution"],
-                    prevention=row["prevention"],
-                    created_at=datetime.fromisoformat(row["sol_created_at"])
-                )
-            
-            results.append(ErrorWithSolution(error=error, solution=solution))
-        
-        return results, total
+        return await self._with_solutions(await cursor.fetchall()), total
     
     async def get_error_by_id(self, error_id: int) -> Optional[ErrorWithSolution]:
         """Get a specific error with its solution."""
         cursor = await self._connection.execute(
-            """
-            SELECT e.*, s.id as sol_id, s.root_cause, s.impact, s.solution, s.prevention, s.created_at as sol_created_at
-            FROM errors e
-            LEFT JOIN solutions s ON e.id = s.error_id
-            WHERE e.id = ?
-            """,
+            "SELECT * FROM errors WHERE id = ?",
             (error_id,)
         )
         row = await cursor.fetchone()
@@ -190,30 +344,7 @@ class Database:
         if not row:
             return None
         
-        error = DetectedError(
-            id=row["id"],
-            device_id=row["device_id"],
-            timestamp=datetime.fromisoformat(row["timestamp"]),
-            error_line=row["error_line"],
-            context=row["context"],
-            severity=Severity(row["severity"]),
-            pattern_matched=row["pattern_matched"] or "",
-            created_at=datetime.fromisoformat(row["created_at"])
-        )
-        
-        solution = None
-        if row["sol_id"]:
-            solution = Solution(
-                id=row["sol_id"],
-                error_id=row["id"],
-                root_cause=row["root_cause"],
-                impact=row["impact"],
-                solution=row["solution"],
-                prevention=row["prevention"],
-                created_at=datetime.fromisoformat(row["sol_created_at"])
-            )
-        
-        return ErrorWithSolution(error=error, solution=solution)
+        return (await self._with_solutions([row]))[0]
     
     async def get_device_stats(self) -> List[dict]:
         """Get error statistics per device."""
@@ -228,8 +359,13 @@ class Database:
             ORDER BY error_count DESC
             """
         )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+        stats = []
+        for row in await cursor.fetchall():
+            stat = dict(row)
+            if stat["last_error"] is not None:
+                stat["last_error"] = _from_epoch_ms(stat["last_error"])
+            stats.append(stat)
+        return stats
     
     async def get_errors_without_solutions(self) -> List[DetectedError]:
         """Get all errors that don't have solutions yet."""
@@ -243,22 +379,30 @@ class Database:
             """
         )
         rows = await cursor.fetchall()
+        return [self._row_to_error(row) for row in rows]
+    
+    async def get_errors_without_solutions_after(
+        self, after_id: int = 0, limit: int = 100
+    ) -> List[DetectedError]:
+        """
+        Get up to limit errors without solutions whose ID is above after_id.
         
-        results = []
-        for row in rows:
-            error = DetectedError(
-                id=row["id"],
-                device_id=row["device_id"],
-                timestamp=datetime.fromisoformat(row["timestamp"]),
-                error_line=row["error_line"],
-                context=row["context"],
-                severity=Severity(row["severity"]),
-                pattern_matched=row["pattern_matched"] or "",
-                created_at=datetime.fromisoformat(row["created_at"])
-            )
-            results.append(error)
-        
-        return results
+        Pages are keyed on the error ID, so callers can walk a large backlog
+        without holding a cursor open between pages.
+        """
+        cursor = await self._connection.execute(
+            """
+            SELECT e.*
+            FROM errors e
+            LEFT JOIN solutions s ON e.id = s.error_id
+            WHERE s.id IS NULL AND e.id > ?
+            ORDER BY e.id
+            LIMIT ?
+            """,
+            (after_id, limit)
+        )
+        rows = await cursor.fetchall()
+        return [self._row_to_error(row) for row in rows]
     
     async def dismiss_error(self, error_id: int) -> bool:
         """Dismiss a single error from the dashboard."""
@@ -293,46 +437,15 @@ class Database:
         offset = (page - 1) * per_page
         cursor = await self._connection.execute(
             """
-            SELECT e.*, s.id as sol_id, s.root_cause, s.impact, s.solution, s.prevention, s.created_at as sol_created_at
-            FROM errors e
-            LEFT JOIN solutions s ON e.id = s.error_id
-            WHERE e.dismissed = 0
-            ORDER BY e.created_at DESC
+            SELECT * FROM errors
+            WHERE dismissed = 0
+            ORDER BY created_at DESC
             LIMIT ? OFFSET ?
             """,
             [per_page, offset]
         )
         
-        rows = await cursor.fetchall()
-        results = []
-        
-        for row in rows:
-            error = DetectedError(
-                id=row["id"],
-                device_id=row["device_id"],
-                timestamp=datetime.fromisoformat(row["timestamp"]),
-                error_line=row["error_line"],
-                context=row["context"],
-                severity=Severity(row["severity"]),
-                pattern_matched=row["pattern_matched"] or "",
-                created_at=datetime.fromisoformat(row["created_at"])
-            )
-            
-            solution = None
-            if row["sol_id"]:
-                solution = Solution(
-                    id=row["sol_id"],
-                    error_id=row["id"],
-                    root_cause=row["root_cause"],
-                    impact=row["impact"],
-                    solution=row["solution"],
-                    prevention=row["prevention"],
-                    created_at=datetime.fromisoformat(row["sol_created_at"])
-                )
-            
-            results.append(ErrorWithSolution(error=error, solution=solution))
-        
-        return results, total
+        return await self._with_solutions(await cursor.fetchall()), total
 
 
 # Global database instance
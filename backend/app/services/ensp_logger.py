@@ -1,20 +1,25 @@
 """eNSP Console Logger - Passive packet capture using Scapy."""
 import datetime
+import heapq
 import logging
 import os
 import re
+import socket
+import struct
 import time
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Optional, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 try:
-    from scapy.all import AsyncSniffer, Raw, get_if_list, sniff, IP, IPv6  # type: ignore
+    from scapy.all import AsyncSniffer, Padding, conf, get_if_list, sniff, IP, IPv6  # type: ignore
     SCAPY_AVAILABLE = True
 except ImportError:
     SCAPY_AVAILABLE = False
     AsyncSniffer = None
-    Raw = None
+    conf = None
+    Padding = None
     get_if_list = None
     sniff = None
     IP = None
@@ -35,11 +40,47 @@ TELNET_DONT = 254
 
 ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
 CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0B\x0C\x0E-\x1F]")
+# One line ending at its first CR or LF, so "\r\n" yields a bare "\n" line
+LINE_RE = re.compile(r"[^\r\n]*[\r\n]")
+REPEATED_CHAR_RE = re.compile(r"(.)\1+", re.DOTALL)
+
+# Router prompts carrying the hostname, tried in order
+DEVICE_NAME_PATTERNS = (
+    re.compile(r"<([^>\-\s]+(?:-[^>\s]+)?)>"),      # <R1>, <Router-1>
+    re.compile(r"\[([^\]\-\s]+(?:-[^\]\s]+)?)\]"),  # [R1], [Router-1]
+    re.compile(r"^([A-Za-z][A-Za-z0-9\-_]*)[#>]"),  # R1#, R1>
+)
+# Prompt-like words that are never hostnames
+EXCLUDED_DEVICE_NAMES = frozenset({
+    "huawei", "system", "config", "user", "info",
+    "warning", "error", "debug", "display", "show",
+})
+
+# Log files are flushed once per packet, so the buffer only has to hold one
+# packet's worth of lines.
+LOG_BUFFER_SIZE = 65536
+
+# Link-layer header sizes for the capture types the frame fast path parses
+# itself; frames of any other type are dissected by Scapy instead.
+LINK_HEADER_LENGTHS = {
+    "Ether": 14,  # untagged; see ethernet_ip_offset for VLAN tags
+    "Loopback": 4,  # Npcap loopback (DLT_NULL)
+    "CookedLinux": 16,
+    "CookedLinuxV2": 20,
+    "IP": 0,
+    "IPv6": 0,
+}
+IPPROTO_TCP = 6
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+# 802.1Q and 802.1ad (QinQ) tags, each 4 bytes ahead of the inner ethertype
+VLAN_ETHERTYPES = (0x8100, 0x88A8)
 
 # If capture drops packets, avoid getting stuck waiting forever.
 MAX_GAP_BYTES = 8192
 GAP_TIMEOUT_SEC = 1.0
 RECENT_LINE_TTL_SEC = 0.5
+RECENT_LINES_MAX = 2048
 FORCE_FLUSH_PATTERNS = (
     "Unrecognized command found at '^' position.",
     "Error:",
@@ -56,6 +97,7 @@ SERVER_HINT_PATTERNS = (
     b"Login",
     b"^",
 )
+SERVER_HINT_RE = re.compile(b"|".join(re.escape(token) for token in SERVER_HINT_PATTERNS))
 
 
 @dataclass
@@ -75,10 +117,67 @@ class TcpStreamState:
 
     next_seq: Optional[int] = None
     pending: Dict[int, bytes] = field(default_factory=dict)
-    last_seen: float = field(default_factory=datetime.datetime.now().timestamp)
+    # Min-heap of the sequence numbers in pending
+    pending_seqs: List[int] = field(default_factory=list)
+    last_seen: float = field(default_factory=time.time)
     gap_since: Optional[float] = None
 
 
+def ethernet_ip_offset(frame: bytes) -> Optional[int]:
+    """Return where the IP header starts in an Ethernet frame, past any VLAN tags.
+
+    Returns None when the frame does not carry IPv4 or IPv6.
+    """
+    offset = 12
+    try:
+        ethertype = struct.unpack_from("!H", frame, offset)[0]
+        while ethertype in VLAN_ETHERTYPES:
+            offset += 4
+            ethertype = struct.unpack_from("!H", frame, offset)[0]
+    except struct.error:
+        return None
+    if ethertype != ETHERTYPE_IPV4 and ethertype != ETHERTYPE_IPV6:
+        return None
+    return offset + 2
+
+
+def parse_tcp_frame(frame: bytes, offset: int) -> Optional[Tuple[str, str, int, int, int, int, bytes]]:
+    """Parse IP/TCP headers at offset into (src, dst, sport, dport, flags, seq, payload).
+
+    Returns None unless the frame is TCP over IPv4, or IPv6 without extension headers.
+    """
+    try:
+        version = frame[offset] >> 4
+        if version == 4:
+            if frame[offset + 9] != IPPROTO_TCP:
+                return None
+            tcp = offset + (frame[offset] & 0x0F) * 4
+            # Total length, so Ethernet padding is not read as payload
+            end = offset + struct.unpack_from("!H", frame, offset + 2)[0]
+            src = socket.inet_ntop(socket.AF_INET, frame[offset + 12:offset + 16])
+            dst = socket.inet_ntop(socket.AF_INET, frame[offset + 16:offset + 20])
+        elif version == 6:
+            if frame[offset + 6] != IPPROTO_TCP:
+                return None
+            tcp = offset + 40
+            end = tcp + struct.unpack_from("!H", frame, offset + 4)[0]
+            src = socket.inet_ntop(socket.AF_INET6, frame[offset + 8:offset + 24])
+            dst = socket.inet_ntop(socket.AF_INET6, frame[offset + 24:offset + 40])
+        else:
+            return None
+        sport, dport, seq = struct.unpack_from("!HHI", frame, tcp)
+        flags = frame[tcp + 13]
+        start = tcp + (frame[tcp + 12] >> 4) * 4
+        if end < start:
+            # Segmentation offload leaves the IP length 0 (or short) on
+            # captured frames; the payload then runs to the end of the frame
+            end = len(frame)
+        payload = frame[start:end]
+    except (IndexError, struct.error, ValueError):
+        return None
+    return src, dst, sport, dport, flags, seq, payload
+
+
 class SessionLogger:
     """Manages log files for each eNSP console port with stream-safe text cleaning."""
 
@@ -94,7 +193,10 @@ class SessionLogger:
         self.duplicate_prompt_count: Dict[Tuple[int, str], int] = {}
         self.telnet_states: Dict[Tuple[int, str], TelnetDecodeState] = {}
         self.last_outgoing: Dict[int, Tuple[str, float]] = {}
-        self.recent_lines: Dict[Tuple[int, str, str], float] = {}
+        self.recent_lines: OrderedDict[Tuple[int, str, str], float] = OrderedDict()
+        self.unflushed_ports: Set[int] = set()
+        self._last_ts_sec = -1
+        self._last_ts_str = ""
         self.debug_port: Optional[int] = None
         dbg = os.getenv("ENSP_DEBUG_PORT")
         if dbg and dbg.isdigit():
@@ -109,7 +211,7 @@ class SessionLogger:
             device_name = self.device_names.get(port, f"device_{port}")
             path = self.log_dir / f"{device_name}_{port}_{ts}.log"
             self.log_dir.mkdir(parents=True, exist_ok=True)
-            self.handles[port] = open(path, "a", encoding="utf-8")
+            self.handles[port] = open(path, "a", buffering=LOG_BUFFER_SIZE, encoding="utf-8")
             self.files[port] = path
             logger.info(f"Logging port {port} ({device_name}) -> {path.resolve()}")
         except Exception as exc:
@@ -119,6 +221,15 @@ class SessionLogger:
     def _strip_telnet_controls(self, key: Tuple[int, str], data: bytes) -> bytes:
         """Parse Telnet IAC control sequences and emit printable payload bytes only."""
         state = self.telnet_states.setdefault(key, TelnetDecodeState())
+        if (
+            TELNET_IAC not in data
+            and not state.in_subnegotiation
+            and state.pending_option_for is None
+            and not state.pending_iac
+        ):
+            # Most console packets carry no Telnet commands at all
+            return data
+
         out = bytearray()
         i = 0
 
@@ -170,8 +281,13 @@ class SessionLogger:
                 i += 1
                 continue
 
-            out.append(b)
-            i += 1
+            # Plain payload: copy the whole run up to the next IAC at once
+            # instead of appending it byte by byte.
+            end = data.find(TELNET_IAC, i)
+            if end == -1:
+                end = len(data)
+            out += data[i:end]
+            i = end
 
         return bytes(out)
 
@@ -202,14 +318,17 @@ class SessionLogger:
     @staticmethod
     def _apply_backspaces(text: str) -> str:
         """Apply terminal backspace/delete semantics to a text fragment."""
+        if "\x00" in text:
+            text = text.replace("\x00", "")
+        if "\b" not in text and "\x7f" not in text:
+            return text
+
         out = []
         for ch in text:
             if ch in ("\b", "\x7f"):
                 if out and out[-1] not in ("\n", "\r"):
                     out.pop()
                 continue
-            if ch == "\x00":
-                continue
             out.append(ch)
         return "".join(out)
 
@@ -226,10 +345,15 @@ class SessionLogger:
     @staticmethod
     def _clean_console_text(text: str) -> str:
         """Normalize one logical console line without command-specific rewriting."""
-        cleaned = ANSI_ESCAPE_RE.sub("", text)
-        cleaned = cleaned.replace("\x07", "")
-        cleaned = CONTROL_CHARS_RE.sub("", cleaned)
-        cleaned = cleaned.replace("\r\n", "\n").replace("\r", "\n")
+        # Escapes, control chars (bell included) and CR are all unprintable,
+        # so printable text skips the regex passes entirely.
+        cleaned = text
+        if not cleaned.isprintable():
+            # Most unprintable lines only carry CR/LF, not escape sequences
+            if "\x1b" in cleaned:
+                cleaned = ANSI_ESCAPE_RE.sub("", cleaned)
+            cleaned = CONTROL_CHARS_RE.sub("", cleaned)
+            cleaned = cleaned.replace("\r\n", "\n").replace("\r", "\n")
         cleaned = cleaned.strip()
 
         # Fix exact full-line duplication (common with packet overlap artefacts).
@@ -238,7 +362,8 @@ class SessionLogger:
             if cleaned[:half] == cleaned[half:]:
                 cleaned = cleaned[:half]
 
-        cleaned = re.sub(r"\s+", " ", cleaned).strip()
+        # split() already drops leading/trailing whitespace and collapses runs
+        cleaned = " ".join(cleaned.split())
 
         # Repair and normalize error lines when capture drops leading bytes
         # or mixes echoed command text with the error.
@@ -267,27 +392,28 @@ class SessionLogger:
         if not text:
             return ""
 
+        # Every character doubled ("ddiiss") iff the even and odd slices are
+        # equal; slicing and comparing run in C instead of a per-pair loop.
         if len(text) >= 2 and len(text) % 2 == 0:
-            is_pair_doubled = True
-            out = []
-            for i in range(0, len(text), 2):
-                if text[i] != text[i + 1]:
-                    is_pair_doubled = False
-                    break
-                out.append(text[i])
-            if is_pair_doubled:
-                text = "".join(out)
-
-        collapsed = []
-        prev = None
-        for ch in text:
-            if ch == prev:
-                continue
-            collapsed.append(ch)
-            prev = ch
-        return "".join(collapsed)
+            even = text[0::2]
+            if even == text[1::2]:
+                text = even
+
+        return REPEATED_CHAR_RE.sub(r"\1", text)
 
     def write(self, port: int, direction: str, data: bytes):
+        # A packet often carries many lines; flush them in one go afterwards
+        # rather than once per line.
+        try:
+            self._write_payload(port, direction, data)
+        finally:
+            if port in self.unflushed_ports:
+                self.unflushed_ports.discard(port)
+                handle = self.handles.get(port)
+                if handle is not None:
+                    handle.flush()
+
+    def _write_payload(self, port: int, direction: str, data: bytes):
         key = (port, direction)
         payload = self._strip_telnet_controls(key, data)
         if not payload:
@@ -322,21 +448,14 @@ class SessionLogger:
                 buffers[port] = ""
                 return
 
-        while "\n" in buffers[port] or "\r" in buffers[port]:
-            buf = buffers[port]
-            pos_n = buf.find("\n")
-            pos_r = buf.find("\r")
-            if pos_n == -1:
-                split_at = pos_r
-            elif pos_r == -1:
-                split_at = pos_n
-            else:
-                split_at = min(pos_n, pos_r)
-
-            line = buf[: split_at + 1]
-            buffers[port] = buf[split_at + 1 :]
-            if line.strip():
-                self._log_line(port, direction, line)
+        # Split every complete line in one pass and keep the unterminated tail.
+        buf = buffers[port]
+        end = max(buf.rfind("\n"), buf.rfind("\r")) + 1
+        if end:
+            buffers[port] = buf[end:]
+            for line in LINE_RE.findall(buf, 0, end):
+                if line.strip():
+                    self._log_line(port, direction, line)
 
         if direction == INCOMING and buffers[port]:
             frag = buffers[port].strip()
@@ -344,6 +463,14 @@ class SessionLogger:
                 self._log_line(port, direction, frag)
                 buffers[port] = ""
 
+    def _format_timestamp(self, now_ts: float) -> str:
+        """Format a log timestamp, reusing the text while the second is unchanged."""
+        second = int(now_ts)
+        if second != self._last_ts_sec:
+            self._last_ts_sec = second
+            self._last_ts_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        return self._last_ts_str
+
     def _log_line(self, port: int, direction: str, text: str):
         cleaned_text = self._clean_console_text(text)
         if not cleaned_text or cleaned_text.isspace():
@@ -352,15 +479,21 @@ class SessionLogger:
 
         key = (port, direction)
         last_line = self.last_lines.get(key, "")
-        now_ts = datetime.datetime.now().timestamp()
+        now_ts = time.time()
 
         recent_key = (port, direction, cleaned_text)
-        last_seen = self.recent_lines.get(recent_key)
+        recent_lines = self.recent_lines
+        last_seen = recent_lines.get(recent_key)
         if last_seen is not None and (now_ts - last_seen) <= RECENT_LINE_TTL_SEC:
             return
-        self.recent_lines[recent_key] = now_ts
-        if len(self.recent_lines) > 2000:
-            self.recent_lines.clear()
+        recent_lines[recent_key] = now_ts
+        recent_lines.move_to_end(recent_key)
+        # Kept in logging order, so expired lines are always at the front
+        while (
+            len(recent_lines) > RECENT_LINES_MAX
+            or next(iter(recent_lines.values())) < now_ts - RECENT_LINE_TTL_SEC
+        ):
+            recent_lines.popitem(last=False)
 
         # Suppress incoming echo lines that match recent outgoing commands.
         # Never suppress error markers or prompts.
@@ -374,7 +507,7 @@ class SessionLogger:
             last_out = self.last_outgoing.get(port)
             if last_out:
                 last_cmd, ts = last_out
-                if (datetime.datetime.now().timestamp() - ts) <= 2.0:
+                if (now_ts - ts) <= 2.0:
                     if self._normalize_echo(cleaned_text) == self._normalize_echo(last_cmd):
                         self._debug_log(port, "echo_suppressed", b"", text, cleaned_text)
                         return
@@ -391,46 +524,32 @@ class SessionLogger:
         self._detect_device_name(port, direction, cleaned_text)
         self._open(port)
 
-        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        ts = self._format_timestamp(now_ts)
         device_name = self.device_names.get(port, f"device_{port}")
         line = f"[{ts}] [{device_name}] {direction} '{cleaned_text}'\n"
-        handle = self.handles[port]
-        handle.write(line)
-        handle.flush()
+        self.handles[port].write(line)
+        self.unflushed_ports.add(port)
 
         if direction == OUTGOING:
-            self.last_outgoing[port] = (cleaned_text, datetime.datetime.now().timestamp())
+            self.last_outgoing[port] = (cleaned_text, now_ts)
 
     def _detect_device_name(self, port: int, direction: str, text: str):
         """Extract device hostname from router prompts."""
         if direction != INCOMING:
             return
 
-        patterns = [
-            r"<([^>\-\s]+(?:-[^>\s]+)?)>",      # <R1>, <Router-1>
-            r"\[([^\]\-\s]+(?:-[^\]\s]+)?)\]",  # [R1], [Router-1]
-            r"^([A-Za-z][A-Za-z0-9\-_]*)[#>]",  # R1#, R1>
-        ]
+        # Every pattern needs a ">", "[" or "#", which most output lines lack
+        if ">" not in text and "[" not in text and "#" not in text:
+            return
 
-        for pattern in patterns:
-            matches = re.findall(pattern, text.strip())
-            if not matches:
+        stripped = text.strip()
+        for pattern in DEVICE_NAME_PATTERNS:
+            match = pattern.search(stripped)
+            if not match:
                 continue
 
-            hostname = matches[0].strip()
-            excluded = [
-                "huawei",
-                "system",
-                "config",
-                "user",
-                "info",
-                "warning",
-                "error",
-                "debug",
-                "display",
-                "show",
-            ]
-            if not hostname or hostname.lower() in excluded:
+            hostname = match.group(1).strip()
+            if not hostname or hostname.lower() in EXCLUDED_DEVICE_NAMES:
                 continue
 
             if port not in self.device_names or len(hostname) > len(self.device_names[port]):
@@ -467,7 +586,7 @@ class SessionLogger:
 
             old_path.rename(new_path)
             self.files[port] = new_path
-            self.handles[port] = open(new_path, "a", encoding="utf-8")
+            self.handles[port] = open(new_path, "a", buffering=LOG_BUFFER_SIZE, encoding="utf-8")
             logger.info(f"Renamed log file: {old_path.name} -> {new_path.name}")
         except Exception as exc:
             logger.warning(f"Failed to rename log file for port {port}: {exc}")
@@ -480,6 +599,7 @@ class SessionLogger:
             except Exception:
                 pass
         self.handles.clear()
+        self.unflushed_ports.clear()
         self.files.clear()
         self.last_lines.clear()
         self.duplicate_prompt_count.clear()
@@ -517,6 +637,7 @@ class ENSPPacketSniffer:
         self._pkts_out = 0
         self._last_stats = time.time()
         self._port_stats: Dict[int, Dict[str, int]] = {}
+        self._link_layer = None
 
     def _build_bpf_filter(self) -> str:
         if self.auto_detect:
@@ -583,22 +704,13 @@ class ENSPPacketSniffer:
         if state.next_seq is None:
             return bytes(emitted)
 
-        while state.pending:
-            best_seq = None
-            best_payload = b""
-            for seq, payload in state.pending.items():
-                end_seq = seq + len(payload)
-                if seq <= state.next_seq < end_seq:
-                    if best_seq is None or seq < best_seq:
-                        best_seq = seq
-                        best_payload = payload
-
-            if best_seq is None:
-                break
-
-            state.pending.pop(best_seq)
-            offset = state.next_seq - best_seq
-            tail = best_payload[offset:]
+        # Segments are taken lowest seq first. One starting at or before
+        # next_seq either covers it or lies wholly behind it and can never
+        # be used, since next_seq only moves forward until a resync.
+        while state.pending_seqs and state.pending_seqs[0] <= state.next_seq:
+            seq = heapq.heappop(state.pending_seqs)
+            payload = state.pending.pop(seq)
+            tail = payload[state.next_seq - seq:]
             if not tail:
                 continue
 
@@ -617,7 +729,7 @@ class ENSPPacketSniffer:
             return b""
 
         state = self._streams.setdefault(stream_key, TcpStreamState())
-        state.last_seen = datetime.datetime.now().timestamp()
+        state.last_seen = time.time()
 
         if state.next_seq is None:
             state.next_seq = seq
@@ -641,13 +753,16 @@ class ENSPPacketSniffer:
             if gap_bytes >= MAX_GAP_BYTES or gap_age >= GAP_TIMEOUT_SEC:
                 state.next_seq = seq
                 state.pending.clear()
+                state.pending_seqs.clear()
                 state.gap_since = None
             else:
                 current = state.pending.get(seq)
+                if current is None:
+                    heapq.heappush(state.pending_seqs, seq)
                 if current is None or len(payload) > len(current):
                     state.pending[seq] = payload
                 if len(state.pending) > 256:
-                    oldest = min(state.pending)
+                    oldest = heapq.heappop(state.pending_seqs)
                     state.pending.pop(oldest, None)
                 return b""
 
@@ -658,114 +773,172 @@ class ENSPPacketSniffer:
         emitted.extend(self._consume_pending(state))
         return bytes(emitted)
 
-    def _on_packet(self, pkt):
+    def _raw_frame_socket(self):
+        """Build a listen socket class that hands frames to prn undissected.
+
+        Scapy otherwise dissects every frame into layer objects before prn,
+        which costs far more than reading the few header fields needed here.
+        The link type is recorded so _on_frame knows where the IP header starts.
+        """
+        sniffer = self
+
+        class RawFrameListenSocket(conf.L2listen):
+            def recv_raw(self, *args, **kwargs):
+                cls, data, ts = super().recv_raw(*args, **kwargs)
+                if cls is None:
+                    return cls, data, ts
+                sniffer._link_layer = cls
+                return conf.raw_layer, data, ts
+
+        return RawFrameListenSocket
+
+    def _on_frame(self, pkt):
+        """Handle an undissected frame, parsing IP/TCP headers with struct."""
         try:
-            if not pkt.haslayer(Raw):
+            link_layer = self._link_layer
+            name = link_layer.__name__ if link_layer else None
+            offset = LINK_HEADER_LENGTHS.get(name)
+            frame = pkt.load
+            if name == "Ether":
+                # VLAN tags move the IP header back; non-IP frames have none
+                offset = ethernet_ip_offset(frame)
+            if offset is None:
+                # Unknown link type or payload: let Scapy dissect it
+                self._on_packet(link_layer(frame) if link_layer else pkt)
+                return
+            segment = parse_tcp_frame(frame, offset)
+            if segment is None:
                 return
+            src, dst, sport, dport, flags, seq, raw_payload = segment
+            if raw_payload:
+                self._handle_segment(src, dst, sport, dport, flags, seq, raw_payload)
+        except Exception as exc:
+            logger.error(f"Error processing packet: {exc}")
+
+    def _on_packet(self, pkt):
+        """Handle a packet already dissected by Scapy."""
+        try:
             tcp = pkt.getlayer("TCP")
             if tcp is None:
                 return
+            # The TCP payload itself: Scapy may dissect console ports as
+            # another protocol (2000 is Skinny) and strip leading bytes.
+            raw_payload = bytes(tcp.payload)
+            padding = tcp.getlayer(Padding)
+            if padding is not None:
+                raw_payload = raw_payload[:-len(padding.load)]
+            if not raw_payload:
+                return
 
-            sport = int(tcp.sport)
-            dport = int(tcp.dport)
-
-            port = None
-            direction = None
             ip = None
             if IP is not None:
                 ip = pkt.getlayer("IP")
             if ip is None and IPv6 is not None:
                 ip = pkt.getlayer("IPv6")
+            src = str(ip.src) if ip is not None else None
+            dst = str(ip.dst) if ip is not None else None
 
-            if ip is not None:
-                src_ep = (str(ip.src), sport)
-                dst_ep = (str(ip.dst), dport)
-                conn_key = tuple(sorted([src_ep, dst_ep]))
-
-                flags = int(getattr(tcp, "flags", 0))
-                syn = (flags & 0x02) != 0
-                ack = (flags & 0x10) != 0
-                if syn and not ack:
-                    # Client -> server SYN
-                    if dport in self.console_ports:
-                        self._conn_server[conn_key] = dst_ep
-                elif syn and ack:
-                    # Server -> client SYN-ACK
-                    if sport in self.console_ports:
-                        self._conn_server[conn_key] = src_ep
-
-                server_ep = self._conn_server.get(conn_key)
-                if server_ep is not None:
-                    direction = INCOMING if src_ep == server_ep else OUTGOING
-                    port = server_ep[1]
-                else:
-                    # Heuristic for already-established sessions where we missed SYN/SYN-ACK.
-                    if sport in self.console_ports and dport in self.console_ports:
-                        raw_payload = bytes(pkt[Raw].load)
-                        if any(token in raw_payload for token in SERVER_HINT_PATTERNS):
-                            self._conn_server[conn_key] = src_ep
-                            direction = INCOMING
-                            port = src_ep[1]
-                        else:
-                            self._conn_server[conn_key] = dst_ep
-                            direction = OUTGOING
-                            port = dst_ep[1]
-
-            if direction is None:
-                if dport in self.console_ports:
-                    port = dport
-                    direction = OUTGOING
-                elif sport in self.console_ports:
-                    port = sport
-                    direction = INCOMING
-            if port is None or direction is None:
-                return
-
-            raw_payload = bytes(pkt[Raw].load)
-            if not raw_payload:
-                return
+            self._handle_segment(
+                src, dst, int(tcp.sport), int(tcp.dport),
+                int(getattr(tcp, "flags", 0)), int(getattr(tcp, "seq", 0)), raw_payload
+            )
+        except Exception as exc:
+            logger.error(f"Error processing packet: {exc}")
 
-            if direction == INCOMING:
-                self._pkts_in += 1
-                self._bytes_in += len(raw_payload)
+    def _handle_segment(
+        self,
+        src: Optional[str],
+        dst: Optional[str],
+        sport: int,
+        dport: int,
+        flags: int,
+        seq: int,
+        raw_payload: bytes,
+    ):
+        """Attribute a TCP payload to a console port and direction, then log it."""
+        # Runs for every captured packet: test port membership once up front
+        from_console = sport in self.console_ports
+        to_console = dport in self.console_ports
+        port = None
+        direction = None
+        if src is not None and dst is not None:
+            src_ep = (src, sport)
+            dst_ep = (dst, dport)
+            conn_key = (src_ep, dst_ep) if src_ep <= dst_ep else (dst_ep, src_ep)
+
+            syn = (flags & 0x02) != 0
+            ack = (flags & 0x10) != 0
+            if syn and not ack:
+                # Client -> server SYN
+                if to_console:
+                    self._conn_server[conn_key] = dst_ep
+            elif syn and ack:
+                # Server -> client SYN-ACK
+                if from_console:
+                    self._conn_server[conn_key] = src_ep
+
+            server_ep = self._conn_server.get(conn_key)
+            if server_ep is not None:
+                direction = INCOMING if src_ep == server_ep else OUTGOING
+                port = server_ep[1]
             else:
-                self._pkts_out += 1
-                self._bytes_out += len(raw_payload)
+                # Heuristic for already-established sessions where we missed SYN/SYN-ACK.
+                if from_console and to_console:
+                    if SERVER_HINT_RE.search(raw_payload):
+                        self._conn_server[conn_key] = src_ep
+                        direction = INCOMING
+                        port = src_ep[1]
+                    else:
+                        self._conn_server[conn_key] = dst_ep
+                        direction = OUTGOING
+                        port = dst_ep[1]
+
+        if direction is None:
+            if to_console:
+                port = dport
+                direction = OUTGOING
+            elif from_console:
+                port = sport
+                direction = INCOMING
+        if port is None or direction is None:
+            return
 
-            port_stat = self._port_stats.setdefault(
-                port,
-                {"in_pkts": 0, "in_bytes": 0, "out_pkts": 0, "out_bytes": 0},
+        size = len(raw_payload)
+        port_stat = self._port_stats.setdefault(
+            port,
+            {"in_pkts": 0, "in_bytes": 0, "out_pkts": 0, "out_bytes": 0},
+        )
+        if direction == INCOMING:
+            self._pkts_in += 1
+            self._bytes_in += size
+            port_stat["in_pkts"] += 1
+            port_stat["in_bytes"] += size
+        else:
+            self._pkts_out += 1
+            self._bytes_out += size
+            port_stat["out_pkts"] += 1
+            port_stat["out_bytes"] += size
+
+        stream_key = (port, sport, dport, direction)
+        payload = self._reassemble_payload(stream_key, seq, raw_payload)
+        if payload and self.session_logger:
+            self.session_logger.write(port, direction, payload)
+
+        now = time.time()
+        if now - self._last_stats >= 5.0:
+            per_port = ", ".join(
+                f"{p}:in={s['in_pkts']}/{s['in_bytes']} out={s['out_pkts']}/{s['out_bytes']}"
+                for p, s in sorted(self._port_stats.items())
             )
-            if direction == INCOMING:
-                port_stat["in_pkts"] += 1
-                port_stat["in_bytes"] += len(raw_payload)
-            else:
-                port_stat["out_pkts"] += 1
-                port_stat["out_bytes"] += len(raw_payload)
-
-            stream_key = (port, sport, dport, direction)
-            seq = int(getattr(tcp, "seq", 0))
-            payload = self._reassemble_payload(stream_key, seq, raw_payload)
-            if payload and self.session_logger:
-                self.session_logger.write(port, direction, payload)
-
-            now = time.time()
-            if now - self._last_stats >= 5.0:
-                per_port = ", ".join(
-                    f"{p}:in={s['in_pkts']}/{s['in_bytes']} out={s['out_pkts']}/{s['out_bytes']}"
-                    for p, s in sorted(self._port_stats.items())
-                )
-                logger.info(
-                    "Sniffer stats: in=%d pkts/%d bytes, out=%d pkts/%d bytes, per-port: %s",
-                    self._pkts_in,
-                    self._bytes_in,
-                    self._pkts_out,
-                    self._bytes_out,
-                    per_port or "-",
-                )
-                self._last_stats = now
-        except Exception as exc:
-            logger.error(f"Error processing packet: {exc}")
+            logger.info(
+                "Sniffer stats: in=%d pkts/%d bytes, out=%d pkts/%d bytes, per-port: %s",
+                self._pkts_in,
+                self._bytes_in,
+                self._pkts_out,
+                self._bytes_out,
+                per_port or "-",
+            )
+            self._last_stats = now
 
     def start(self):
         if self._running:
@@ -795,11 +968,13 @@ class ENSPPacketSniffer:
             self._last_stats = time.time()
             self._port_stats.clear()
 
+            self._link_layer = None
             self.sniffer = AsyncSniffer(
                 iface=iface,
                 filter=bpf_filter,
-                prn=self._on_packet,
+                prn=self._on_frame,
                 store=False,
+                L2socket=self._raw_frame_socket(),
             )
 
             self.sniffer.start()
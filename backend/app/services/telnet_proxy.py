@@ -20,6 +20,17 @@ INCOMING = "←"
 ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
 CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0B\x0C\x0E-\x1F]")
 
+# Router prompts carrying the hostname, tried in order
+DEVICE_NAME_PATTERNS = (
+    re.compile(r"<([^>\s]+(?:-[^>\s]+)?)>"),     # <R1>, <Router-1>
+    re.compile(r"\[([^\]\s]+(?:-[^\]\s]+)?)\]"),  # [R1], [Router-1]
+    re.compile(r"^([A-Za-z][A-Za-z0-9\-_]*)[#>]"),  # R1#, R1>
+)
+# Prompt-like words that are never hostnames
+EXCLUDED_DEVICE_NAMES = frozenset({
+    "huawei", "system", "config", "user", "info", "warning", "error", "debug",
+})
+
 
 class ProxySessionLogger:
     """Manages log files for proxy sessions with clean text output."""
@@ -50,27 +61,25 @@ class ProxySessionLogger:
     @staticmethod
     def _clean_text(text: str) -> str:
         """Clean text for logging — strip ANSI escapes and control chars."""
+        if text.isprintable():
+            return text  # no escapes, control chars or CR to remove
         cleaned = ANSI_ESCAPE_RE.sub("", text)
-        cleaned = cleaned.replace("\x07", "")  # bell
-        cleaned = CONTROL_CHARS_RE.sub("", cleaned)
+        cleaned = CONTROL_CHARS_RE.sub("", cleaned)  # includes bell
         cleaned = cleaned.replace("\r\n", "\n").replace("\r", "\n")
         return cleaned
 
     def _detect_device_name(self, port: int, text: str):
         """Extract device hostname from router prompts in response text."""
-        patterns = [
-            r"<([^>\s]+(?:-[^>\s]+)?)>",     # <R1>, <Router-1>
-            r"\[([^\]\s]+(?:-[^\]\s]+)?)\]",  # [R1], [Router-1]
-            r"^([A-Za-z][A-Za-z0-9\-_]*)[#>]",  # R1#, R1>
-        ]
-        excluded = {"huawei", "system", "config", "user", "info", "warning", "error", "debug"}
-
-        for pattern in patterns:
-            matches = re.findall(pattern, text.strip())
-            if not matches:
+        # Every pattern needs a ">", "[" or "#", which most output lines lack
+        if ">" not in text and "[" not in text and "#" not in text:
+            return
+        stripped = text.strip()
+        for pattern in DEVICE_NAME_PATTERNS:
+            match = pattern.search(stripped)
+            if not match:
                 continue
-            hostname = matches[0].strip()
-            if not hostname or hostname.lower() in excluded:
+            hostname = match.group(1).strip()
+            if not hostname or hostname.lower() in EXCLUDED_DEVICE_NAMES:
                 continue
             if port not in self.device_names or hostname != self.device_names[port]:
                 old = self.device_names.get(port, f"device_{port}")
@@ -0,0 +1,60 @@
+"""Tests for the offline log cleaning utility."""
+from advanced_clean_logs import _find_log_files, clean_log_file_advanced, is_router_prompt
+
+
+class TestRouterPrompt:
+    """Tests for router prompt detection."""
+    
+    def test_detects_prompt_forms(self):
+        """Test that every prompt form is recognized."""
+        for text in ("<R1>", "<R1>display ip", "[R1]", "R1>", "R1#", "Router-1#"):
+            assert is_router_prompt(text), text
+    
+    def test_detects_prompt_with_trailing_whitespace(self):
+        """Test that whitespace around a prompt does not hide it."""
+        for text in ("R1> ", "R1#\t", "  [R1] ", "<R1>  "):
+            assert is_router_prompt(text), repr(text)
+    
+    def test_rejects_output_lines(self):
+        """Test that ordinary output and blank text are not prompts."""
+        for text in ("", "   ", "Interface GE0/0/1 is down", "1 > 0", "Error: bad"):
+            assert not is_router_prompt(text), repr(text)
+
+
+class TestCleanLogFile:
+    """Tests for whole-file cleaning."""
+    
+    def test_splits_lines_on_any_line_ending(self, tmp_path):
+        """Test that CR-only, LF and CRLF line endings all end a log line."""
+        source = tmp_path / "R1_2000.log"
+        source.write_bytes(
+            b"[2026-01-18 03:10:25] [R1] \xe2\x86\x92 'ddiissppllaayy'\r"
+            b"[2026-01-18 03:10:26] [R1] \xe2\x86\x92 'display'\r\n"
+            b"[2026-01-18 03:10:27] [R1] \xe2\x86\x90 'Error: bad input'\r"
+            b"[2026-01-18 03:10:28] [R1] \xe2\x86\x90 'done'\n"
+        )
+        output = tmp_path / "R1_2000.clean.log"
+        
+        clean_log_file_advanced(source, output)
+        
+        # Each line is undoubled and deduplicated on its own
+        assert output.read_bytes().decode("utf-8").split("\n") == [
+            "[2026-01-18 03:10:25] [R1] → 'display'",
+            "[2026-01-18 03:10:27] [R1] ← 'Error: bad input'",
+            "[2026-01-18 03:10:28] [R1] ← 'done'",
+            "",
+        ]
+
+
+class TestFindLogFiles:
+    """Tests for log file discovery."""
+    
+    def test_matches_log_suffix_in_any_case(self, tmp_path):
+        """Test that .log files are found regardless of case, skipping cleaned output."""
+        for name in ("R1_2000.log", "R2_2001.LOG", "R1_2000.clean.log", "notes.txt"):
+            (tmp_path / name).write_text("", encoding="utf-8")
+        (tmp_path / "archive.log").mkdir()
+        
+        found = sorted(path.name for path in _find_log_files(tmp_path))
+        
+        assert found == ["R1_2000.log", "R2_2001.LOG"]
@@ -0,0 +1,114 @@
+"""Tests for the error analyzer."""
+import asyncio
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+from app.core.analyzer import ErrorAnalyzer
+from app.core.extractor import context_extractor
+from app.models.error import Direction, LogLine, Severity
+
+
+def _make_lines(start: int, count: int):
+    base = datetime(2026, 1, 18, 3, 0, 0)
+    return [
+        LogLine(
+            timestamp=base + timedelta(seconds=i),
+            device_id="R1",
+            direction=Direction.IN,
+            content=f"line {i}",
+            raw=f"line {i}",
+        )
+        for i in range(start, start + count)
+    ]
+
+
+class TestLineCache:
+    """Tests for the per-file context caches."""
+
+    def test_cache_returns_earlier_lines_and_keeps_tail(self):
+        """Test that a batch sees earlier lines and only the needed tail is kept."""
+        analyzer = ErrorAnalyzer()
+        keep = context_extractor.context_lines // 2
+        first = _make_lines(0, keep + 5)
+        first[2] = replace(first[2], direction=Direction.OUT)
+
+        earlier_lines, earlier_commands = analyzer._cache_lines("r1.log", first)
+        assert earlier_lines == [] and earlier_commands == []
+
+        earlier_lines, earlier_commands = analyzer._cache_lines("r1.log", _make_lines(100, 1))
+        assert earlier_lines == first[-keep:]
+        assert earlier_commands == [first[2]]
+
+    def test_context_and_history_for_error_in_batch(self):
+        """Test that context spans batches and history includes earlier commands."""
+        analyzer = ErrorAnalyzer()
+        # A plain "out" string must still be treated as a command
+        command = replace(_make_lines(0, 1)[0], direction="out", content="display ip")
+        analyzer._cache_lines("r1.log", [command])
+        batch = _make_lines(1, 3)
+        earlier_lines, earlier_commands = analyzer._cache_lines("r1.log", batch)
+
+        error, history = analyzer._prepare_error(
+            earlier_lines + batch, len(earlier_lines) + 1,
+            analyzer._commands_before(earlier_commands, batch, [], 1),
+            Severity.CRITICAL, "line"
+        )
+
+        assert error.error_line == "line 2"
+        assert ">>> " in error.context and "display ip" in error.context
+        assert ">>> [03:00:02] <- line 2" in error.context
+        assert history == "  display ip"
+
+    def test_commands_before_matches_backward_scan(self):
+        """Test that bisected command history equals scanning back over the batch."""
+        earlier_commands = [
+            replace(line, direction=Direction.OUT, content=f"old {i}")
+            for i, line in enumerate(_make_lines(0, 4))
+        ]
+        batch = [
+            replace(line, direction=Direction.OUT) if i % 3 == 0 else line
+            for i, line in enumerate(_make_lines(10, 40))
+        ]
+        positions = [i for i, line in enumerate(batch) if line.direction is Direction.OUT]
+
+        for position in (0, 1, 7, 39):
+            commands = ErrorAnalyzer._commands_before(earlier_commands, batch, positions, position)
+            assert context_extractor.get_command_history(commands, len(commands)) == (
+                context_extractor.get_command_history(
+                    earlier_commands + batch, len(earlier_commands) + position
+                )
+            )
+
+    def test_clear_cache(self):
+        """Test that clearing drops lines and commands together."""
+        analyzer = ErrorAnalyzer()
+        analyzer._cache_lines("r1.log", _make_lines(0, 3))
+        analyzer.clear_cache()
+
+        assert analyzer._file_lines_cache == {}
+        assert analyzer._file_commands_cache == {}
+
+
+class TestBroadcast:
+    """Tests for broadcasting to registered callbacks."""
+
+    def test_broadcast_reaches_all_callbacks(self):
+        """Test that async and sync callbacks all run despite a failing one."""
+        analyzer = ErrorAnalyzer()
+        received = []
+
+        async def async_callback(item):
+            received.append(("async", item))
+
+        async def failing_callback(item):
+            raise RuntimeError("client gone")
+
+        def sync_callback(item):
+            received.append(("sync", item))
+
+        for callback in (failing_callback, async_callback, sync_callback):
+            analyzer.register_broadcast(callback)
+
+        asyncio.run(analyzer._broadcast("payload"))
+
+        assert sorted(received) == [("async", "payload"), ("sync", "payload")]
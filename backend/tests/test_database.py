@@ -0,0 +1,308 @@
+"""Tests for the SQLite database service."""
+import asyncio
+import sqlite3
+from datetime import datetime, timezone
+
+from app.models.error import DetectedError, Severity, Solution
+from app.services import database as database_module
+from app.services.database import Database
+
+
+def _make_error(line: str) -> DetectedError:
+    return DetectedError(
+        device_id="R1",
+        timestamp=datetime(2026, 1, 18, 3, 10, 25),
+        error_line=line,
+        context="context",
+        severity=Severity.CRITICAL,
+        pattern_matched=r"Error:\s*",
+    )
+
+
+class TestDatabase:
+    """Tests for Database writes."""
+
+    def test_insert_errors_bulk_returns_row_ids(self, tmp_path):
+        """Test that bulk inserts report the id of every stored row."""
+        database = Database(tmp_path / "test.db")
+
+        async def run():
+            await database.connect()
+            try:
+                first = await database.insert_error(_make_error("Error: first"))
+                ids = await database.insert_errors_bulk(
+                    [_make_error("Error: second"), _make_error("Error: third")]
+                )
+                stored = [await database.get_error_by_id(i) for i in ids]
+                empty = await database.insert_errors_bulk([])
+            finally:
+                await database.close()
+            return first, ids, stored, empty
+
+        first, ids, stored, empty = asyncio.run(run())
+
+        assert ids == [first + 1, first + 2]
+        assert [item.error.error_line for item in stored] == ["Error: second", "Error: third"]
+        assert empty == []
+
+    def test_insert_errors_bulk_ids_survive_concurrent_insert(self, tmp_path):
+        """Test that a concurrent single insert cannot shift the bulk ids."""
+        database = Database(tmp_path / "test.db")
+
+        async def run():
+            await database.connect()
+            try:
+                first = await database.insert_error(_make_error("Error: first"))
+                ids, _ = await asyncio.gather(
+                    database.insert_errors_bulk(
+                        [_make_error(f"Error: bulk {i}") for i in range(3)]
+                    ),
+                    database.insert_solution(Solution(
+                        error_id=first, root_cause="cause", impact="impact",
+                        solution="fix", prevention="prevent",
+                    )),
+                )
+                stored = [await database.get_error_by_id(i) for i in ids]
+            finally:
+                await database.close()
+            return ids, stored
+
+        ids, stored = asyncio.run(run())
+
+        assert [item.error.error_line for item in stored] == [f"Error: bulk {i}" for i in range(3)]
+
+    def test_insert_solutions_bulk_returns_row_ids(self, tmp_path):
+        """Test that bulk solution inserts attach each solution to its error."""
+        database = Database(tmp_path / "test.db")
+
+        async def run():
+            await database.connect()
+            try:
+                error_ids = await database.insert_errors_bulk(
+                    [_make_error("Error: first"), _make_error("Error: second")]
+                )
+                solution_ids = await database.insert_solutions_bulk([
+                    Solution(
+                        error_id=error_id,
+                        root_cause=f"cause {error_id}",
+                        impact="impact",
+                        solution="fix",
+                        prevention="prevent",
+                    )
+                    for error_id in error_ids
+                ])
+                stored = [await database.get_error_by_id(i) for i in error_ids]
+            finally:
+                await database.close()
+            return error_ids, solution_ids, stored
+
+        error_ids, solution_ids, stored = asyncio.run(run())
+
+        assert len(solution_ids) == 2
+        assert [item.solution.id for item in stored] == solution_ids
+        assert [item.solution.root_cause for item in stored] == [f"cause {i}" for i in error_ids]
+
+    def test_insert_solutions_bulk_ids_survive_concurrent_insert(self, tmp_path):
+        """Test that a concurrent single insert cannot shift the bulk solution ids."""
+        database = Database(tmp_path / "test.db")
+
+        def solution(error_id, cause):
+            return Solution(
+                error_id=error_id, root_cause=cause, impact="impact",
+                solution="fix", prevention="prevent",
+            )
+
+        async def run():
+            await database.connect()
+            try:
+                error_ids = await database.insert_errors_bulk(
+                    [_make_error(f"Error: {i}") for i in range(3)]
+                )
+                solution_ids, _ = await asyncio.gather(
+                    database.insert_solutions_bulk(
+                        [solution(error_id, "bulk") for error_id in error_ids[:2]]
+                    ),
+                    database.insert_solution(solution(error_ids[2], "single")),
+                )
+                stored = [await database.get_error_by_id(i) for i in error_ids[:2]]
+            finally:
+                await database.close()
+            return solution_ids, stored
+
+        solution_ids, stored = asyncio.run(run())
+
+        assert [item.solution.id for item in stored] == solution_ids
+
+    def test_connect_applies_pragmas(self, tmp_path):
+        """Test that connections use WAL with the configured sync level."""
+        database = Database(tmp_path / "test.db")
+
+        async def run():
+            await database.connect()
+            try:
+                values = []
+                for pragma in ("journal_mode", "synchronous", "busy_timeout"):
+                    cursor = await database._connection.execute(f"PRAGMA {pragma}")
+                    values.append((await cursor.fetchone())[0])
+            finally:
+                await database.close()
+            return values
+
+        # synchronous=NORMAL reads back as 1
+        assert asyncio.run(run()) == ["wal", 1, 5000]
+
+    def test_listings_pair_errors_with_solutions(self, tmp_path):
+        """Test that listings keep order and attach each error's newest solution."""
+        database = Database(tmp_path / "test.db")
+
+        def solution(error_id: int, cause: str) -> Solution:
+            return Solution(
+                error_id=error_id, root_cause=cause, impact="impact",
+                solution="fix", prevention="prevent",
+            )
+
+        async def run():
+            await database.connect()
+            try:
+                ids = await database.insert_errors_bulk(
+                    [_make_error(f"Error: {i}") for i in range(3)]
+                )
+                await database.insert_solutions_bulk(
+                    [solution(ids[0], "old"), solution(ids[0], "new"), solution(ids[2], "only")]
+                )
+                errors, total = await database.get_errors(per_page=10)
+                active, active_total = await database.get_active_errors(per_page=2)
+            finally:
+                await database.close()
+            return ids, errors, total, active, active_total
+
+        ids, errors, total, active, active_total = asyncio.run(run())
+
+        assert total == active_total == 3
+        assert sorted(item.error.id for item in errors) == ids
+        causes = {item.error.id: item.solution and item.solution.root_cause for item in errors}
+        assert causes == {ids[0]: "new", ids[1]: None, ids[2]: "only"}
+        assert [item.error.id for item in active] == [item.error.id for item in errors[:2]]
+
+    def test_errors_without_solutions_page_by_id(self, tmp_path):
+        """Test that unsolved errors page by ID and match the full listing."""
+        database = Database(tmp_path / "test.db")
+
+        async def run():
+            await database.connect()
+            try:
+                ids = await database.insert_errors_bulk(
+                    [_make_error(f"Error: {i}") for i in range(5)]
+                )
+                await database.insert_solutions_bulk([Solution(
+                    error_id=ids[1], root_cause="cause", impact="impact",
+                    solution="fix", prevention="prevent",
+                )])
+                pages = []
+                last_id = 0
+                while True:
+                    page = await database.get_errors_without_solutions_after(last_id, 2)
+                    if not page:
+                        break
+                    pages.append([error.id for error in page])
+                    last_id = page[-1].id
+                listed = [error.id for error in await database.get_errors_without_solutions()]
+            finally:
+                await database.close()
+            return ids, pages, listed
+
+        ids, pages, listed = asyncio.run(run())
+
+        assert pages == [[ids[0], ids[2]], [ids[3], ids[4]]]
+        assert sorted(listed) == [ids[0]] + ids[2:]
+
+    def test_dashboard_query_uses_index_order(self, tmp_path):
+        """Test that the active-errors page is read from the index without a sort."""
+        database = Database(tmp_path / "test.db")
+
+        async def run():
+            await database.connect()
+            try:
+                cursor = await database._connection.execute(
+                    "EXPLAIN QUERY PLAN SELECT * FROM errors WHERE dismissed = 0 "
+                    "ORDER BY created_at DESC LIMIT 20"
+                )
+                plan = " ".join(row[-1] for row in await cursor.fetchall())
+            finally:
+                await database.close()
+            return plan
+
+        plan = asyncio.run(run())
+
+        assert "idx_errors_active" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_close_gathers_planner_statistics(self, tmp_path):
+        """Test that statistics are collected for a database filled after startup."""
+        path = tmp_path / "test.db"
+        database = Database(path)
+
+        async def run():
+            await database.connect()
+            try:
+                await database.insert_errors_bulk(
+                    [_make_error(f"Error: {i}") for i in range(50)]
+                )
+                await database.get_active_errors()
+            finally:
+                await database.close()
+
+        asyncio.run(run())
+
+        with sqlite3.connect(path) as conn:
+            stats = conn.execute("SELECT idx FROM sqlite_stat1 WHERE tbl = 'errors'").fetchall()
+        assert ("idx_errors_active",) in stats
+
+    def test_timestamps_stored_as_epoch_ms_and_migrated(self, tmp_path):
+        """Test that timestamps round-trip as integers and old ISO text is converted."""
+        path = tmp_path / "test.db"
+        legacy = sqlite3.connect(path)
+        legacy.executescript("""
+            CREATE TABLE errors (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                device_id TEXT NOT NULL,
+                timestamp DATETIME NOT NULL,
+                error_line TEXT NOT NULL,
+                context TEXT NOT NULL,
+                severity TEXT NOT NULL,
+                pattern_matched TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            INSERT INTO errors (device_id, timestamp, error_line, context, severity, created_at)
+            VALUES ('R1', '2026-01-18T03:10:25.500000', 'Error: old', 'c', 'critical', '2026-01-18 03:10:26');
+        """)
+        legacy.close()
+        database = Database(path)
+
+        async def run():
+            await database.connect()
+            try:
+                new_id = await database.insert_error(_make_error("Error: new"))
+                old = await database.get_error_by_id(1)
+                new = await database.get_error_by_id(new_id)
+                cursor = await database._connection.execute(
+                    "SELECT DISTINCT typeof(timestamp), typeof(created_at) FROM errors"
+                )
+                types = await cursor.fetchall()
+                stats = await database.get_device_stats()
+                cursor = await database._connection.execute("PRAGMA user_version")
+                version = (await cursor.fetchone())[0]
+            finally:
+                await database.close()
+            return old, new, [tuple(row) for row in types], stats, version
+
+        old, new, types, stats, version = asyncio.run(run())
+
+        assert old.error.timestamp == datetime(2026, 1, 18, 3, 10, 25, 500000)
+        assert old.error.created_at == datetime(2026, 1, 18, 3, 10, 26)
+        assert new.error.timestamp == datetime(2026, 1, 18, 3, 10, 25)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        assert abs(new.error.created_at - now).total_seconds() < 60
+        assert types == [("integer", "integer")]
+        assert stats[0]["last_error"] == datetime(2026, 1, 18, 3, 10, 25, 500000)
+        assert version == database_module.SCHEMA_VERSION
@@ -1,7 +1,12 @@
 """Tests for the error detector."""
+import asyncio
+import threading
+from datetime import datetime
+
 import pytest
-from app.core.detector import ErrorDetector
-from app.models.error import Severity
+from app.core import detector as detector_module
+from app.core.detector import ErrorDetector, PatternMatcher
+from app.models.error import Direction, LogLine, Severity
 
 
 class TestErrorDetector:
@@ -43,6 +48,16 @@ class TestErrorDetector:
         
         assert len(errors) == 1
     
+    def test_detect_in_multiline_text(self, detector):
+        """Test that each matching line of a text block is reported in order."""
+        text = "all good\n\nWarning: hot\r\nstill fine\nlink down on GE0/0/1\n"
+        errors = detector.detect_in_text(text, "test_device")
+        
+        assert [(line, severity) for line, severity, _ in errors] == [
+            ("Warning: hot", Severity.WARNING),
+            ("link down on GE0/0/1", Severity.CRITICAL),
+        ]
+    
     def test_deduplication(self, detector):
         """Test that duplicate errors are not reported."""
         text = "Error: Same error"
@@ -55,6 +70,93 @@ class TestErrorDetector:
         errors2 = detector.detect_in_text(text, "test_device")
         assert len(errors2) == 0
     
+    def test_deduplication_expires_oldest_first(self, detector, monkeypatch):
+        """Test that entries older than the TTL expire and newer ones stay."""
+        now = [1000.0]
+        monkeypatch.setattr(detector_module.time, "monotonic", lambda: now[0])
+        
+        detector.detect_in_text("Error: first", "test_device")
+        now[0] += detector_module.DEDUP_TTL_SECONDS / 2
+        detector.detect_in_text("Error: second", "test_device")
+        now[0] += detector_module.DEDUP_TTL_SECONDS / 2 + 1
+        
+        assert len(detector.detect_in_text("Error: first", "test_device")) == 1
+        assert len(detector.detect_in_text("Error: second", "test_device")) == 0
+    
+    def test_deduplication_bounded(self, detector, monkeypatch):
+        """Test that the dedup cache evicts its oldest entry past the size cap."""
+        monkeypatch.setattr(detector_module, "DEDUP_MAX_ENTRIES", 2)
+        
+        for name in ("first", "second", "third"):
+            detector.detect_in_text(f"Error: {name}", "test_device")
+        
+        assert len(detector._seen_errors) == 2
+        assert len(detector.detect_in_text("Error: third", "test_device")) == 0
+        assert len(detector.detect_in_text("Error: first", "test_device")) == 1
+    
+    def test_detect_in_lines_async_offloaded(self, detector, monkeypatch):
+        """Test that matching on the worker thread gives the same results."""
+        monkeypatch.setattr(detector_module, "OFFLOAD_MIN_LINES", 0)
+        lines = [
+            LogLine(
+                timestamp=datetime(2026, 1, 18, 3, 10, 25),
+                device_id="R1",
+                direction=Direction.IN,
+                content=content,
+                raw=content,
+            )
+            for content in ("Error: bad", "all good", "Error: bad", "Warning: hot")
+        ]
+        
+        errors = asyncio.run(detector.detect_in_lines_async(lines))
+        
+        assert [(i, line.content, severity) for i, line, severity, _ in errors] == [
+            (0, "Error: bad", Severity.CRITICAL),
+            (3, "Warning: hot", Severity.WARNING),
+        ]
+    
+    @pytest.mark.skipif(not detector_module.HYPERSCAN_AVAILABLE, reason="hyperscan not installed")
+    def test_small_batch_while_large_batch_scans(self, detector, monkeypatch):
+        """Test that the event loop can scan while the worker thread is mid-scan."""
+        assert detector._matcher.engine == "hyperscan"
+        entered, release = threading.Event(), threading.Event()
+        
+        def collect_hit(pattern_id, start, end, flags, hits):
+            hits.append(pattern_id)
+            # Hold the worker's scan open until the loop thread has scanned
+            if threading.current_thread() is not threading.main_thread():
+                entered.set()
+                release.wait(5)
+        
+        monkeypatch.setattr(detector_module, "_collect_hit", collect_hit)
+        
+        def make_lines(prefix, count):
+            return [
+                LogLine(
+                    timestamp=datetime(2026, 1, 18, 3, 10, 25),
+                    device_id="R1",
+                    direction=Direction.IN,
+                    content=f"Error: {prefix} {i}",
+                )
+                for i in range(count)
+            ]
+        
+        async def run():
+            large = asyncio.ensure_future(
+                detector.detect_in_lines_async(make_lines("large", detector_module.OFFLOAD_MIN_LINES + 1))
+            )
+            assert await asyncio.to_thread(entered.wait, 5)
+            try:
+                small = await detector.detect_in_lines_async(make_lines("small", 3))
+            finally:
+                release.set()
+            return await large, small
+        
+        large, small = asyncio.run(run())
+        
+        assert len(large) == detector_module.OFFLOAD_MIN_LINES + 1
+        assert [line.content for _, line, _, _ in small] == [f"Error: small {i}" for i in range(3)]
+    
     def test_no_false_positives(self, detector):
         """Test that normal log lines don't trigger detection."""
         lines = [
@@ -67,9 +169,172 @@ class TestErrorDetector:
             errors = detector.detect_in_text(line, "test")
             assert len(errors) == 0, f"False positive: {line}"
     
+    def test_critical_wins_over_warning_in_one_scan(self, detector):
+        """Test that a line matching both severities is reported as critical."""
+        errors = detector.detect_in_text("Warning: Error: peer reset", "test")
+        
+        assert len(errors) == 1
+        assert errors[0][1] == Severity.CRITICAL
+        assert errors[0][2] == r"Error:\s*"
+    
     def test_add_custom_pattern(self, detector):
         """Test adding custom patterns."""
         detector.add_pattern(r"CUSTOM_ERROR", Severity.CRITICAL)
         
         errors = detector.detect_in_text("CUSTOM_ERROR occurred", "test")
         assert len(errors) == 1
+    
+    def test_matched_pattern_is_source_string(self, detector):
+        """Test that grouped patterns report the original pattern string."""
+        errors = detector.detect_in_text("Interface GE0/0/1 is down", "test")
+        
+        assert len(errors) == 1
+        assert errors[0][2] == r"Interface\s+\S+\s+is\s+down"
+        
+        errors = detector.detect_in_text("OSPF process failure", "test")
+        assert errors[0][2] == r"failure"
+    
+    @pytest.mark.parametrize(
+        "hyperscan_on,ahocorasick_on,re2_on,engine",
+        [
+            pytest.param(True, False, False, "hyperscan", id="hyperscan"),
+            pytest.param(False, True, False, "ahocorasick", id="ahocorasick"),
+            pytest.param(False, False, True, "re2", id="re2"),
+            pytest.param(False, True, True, "ahocorasick", id="ahocorasick+re2"),
+            pytest.param(False, False, False, "re", id="re"),
+        ],
+    )
+    def test_pattern_matcher_engines_agree(
+        self, monkeypatch, hyperscan_on, ahocorasick_on, re2_on, engine
+    ):
+        """Test that every engine tier reports the same source pattern."""
+        # A missing optional engine skips its tier instead of silently
+        # testing the fallback under the tier's name
+        for enabled, flag, package in (
+            (hyperscan_on, "HYPERSCAN_AVAILABLE", "hyperscan"),
+            (ahocorasick_on, "AHOCORASICK_AVAILABLE", "pyahocorasick"),
+            (re2_on, "RE2_AVAILABLE", "google-re2"),
+        ):
+            if enabled and not getattr(detector_module, flag):
+                pytest.skip(f"{package} not installed")
+            monkeypatch.setattr(detector_module, flag, enabled)
+        matcher = PatternMatcher([r"Error:\s*", r"link\s+down"])
+        assert matcher.search("LINK   DOWN, Error: x") == r"Error:\s*"
+        assert matcher.search("LINK   DOWN on port 3") == r"link\s+down"
+        assert matcher.search("all good") is None
+        
+        # Lookbehind is unsupported by Hyperscan/RE2; only that pattern falls
+        # back to re and list priority still holds across engines
+        mixed = PatternMatcher([r"(?<=x)lookbehind", r"link\s+down"])
+        assert mixed.search("xlookbehind") == r"(?<=x)lookbehind"
+        assert mixed.search("link down, xlookbehind") == r"(?<=x)lookbehind"
+        assert mixed.search("link down") == r"link\s+down"
+        if hyperscan_on or re2_on:
+            assert mixed.engine != "re"
+        
+        # Plain literals and regexes interleaved keep list priority
+        literals = PatternMatcher([r"link\s+down", "Permission denied", r"Error:\s*", "failed"])
+        assert literals.engine == engine
+        assert literals.search("FAILED: permission DENIED") == "Permission denied"
+        assert literals.search("login failed, Error: x") == r"Error:\s*"
+        assert literals.search("link down, login failed") == r"link\s+down"
+        assert literals.search("Login FAILED") == "failed"
+    
+    @pytest.mark.skipif(not detector_module.HYPERSCAN_AVAILABLE, reason="hyperscan not installed")
+    def test_hyperscan_database_cache(self, monkeypatch, tmp_path):
+        """Test that a compiled database is written once and reused."""
+        monkeypatch.setattr(detector_module.get_settings(), "detector_cache_dir", str(tmp_path))
+        patterns = [r"Error:\s*", r"link\s+down"]
+        
+        PatternMatcher(patterns)
+        cached = list(tmp_path.glob("detector-*.hsdb"))
+        assert len(cached) == 1
+        
+        matcher = PatternMatcher(patterns)
+        assert matcher.engine == "hyperscan"
+        assert matcher.search("LINK DOWN, Error: x") == r"Error:\s*"
+    
+    def test_prefilter_requires_literal_in_every_pattern(self, monkeypatch):
+        """Test that the substring prefilter is built only when it is safe."""
+        monkeypatch.setattr(detector_module, "HYPERSCAN_AVAILABLE", False)
+        
+        matcher = PatternMatcher([r"OSPF.*neighbor.*down", "failed", "failure"])
+        assert sorted(matcher._required) == ["failed", "failure", "neighbor"]
+        assert matcher.search("ospf NEIGHBOR 1.1.1.1 down") == r"OSPF.*neighbor.*down"
+        assert matcher.search("all interfaces up") is None
+        
+        # A top-level alternation has no required literal
+        assert PatternMatcher([r"failed", r"down|up"])._required is None
+    
+    def test_search_many_matches_per_line_search(self, monkeypatch):
+        """Test that the batch prefilter maps hits back to the right lines."""
+        monkeypatch.setattr(detector_module, "HYPERSCAN_AVAILABLE", False)
+        matcher = PatternMatcher([r"Error:\s*", "failed", r"link\s+down"])
+        contents = [
+            "all good",
+            "Login FAILED",
+            "",
+            "link  down",
+            "multi\nline error: x",
+            "failed",
+            "no match here",
+        ]
+        
+        assert matcher.search_many(contents) == [matcher.search_index(c) for c in contents]
+        assert matcher.search_many(contents) == [None, 1, None, 2, 0, 1, None]
+        assert matcher.search_many(["caf\u00e9 failed", "ok"]) == [1, None]
+    
+    def test_re_automaton_selects_candidate_regexes(self, monkeypatch):
+        """Test that literal preselection of re patterns keeps list priority."""
+        if not detector_module.AHOCORASICK_AVAILABLE:
+            pytest.skip("pyahocorasick not installed")
+        monkeypatch.setattr(detector_module, "HYPERSCAN_AVAILABLE", False)
+        monkeypatch.setattr(detector_module, "RE2_AVAILABLE", False)
+        monkeypatch.setattr(detector_module, "RE_AUTOMATON_MIN_PATTERNS", 0)
+        
+        matcher = PatternMatcher([r"BGP.*failed", r"link\s+down", r"down|up", r"Error:\s*"])
+        assert matcher._re_automaton is not None
+        assert matcher.search("bgp peer failed, Error: x") == r"BGP.*failed"
+        assert matcher.search("Error: LINK DOWN") == r"link\s+down"
+        assert matcher.search("Error: x") == r"Error:\s*"
+        # Patterns without a required literal are always tried
+        assert matcher.search("port up") == r"down|up"
+        assert matcher.search("all good") is None
+    
+    def test_lowercase_pattern_keeps_escapes(self):
+        """Test that only literal characters are lower-cased."""
+        lowercase = detector_module._lowercase_pattern
+        assert lowercase(r"Interface\s+\S+\s+is\s+DOWN") == r"interface\s+\S+\s+is\s+down"
+        assert lowercase(r"[A-Z]+ failed") is None
+        assert lowercase(r"\x45rror") is None
+    
+    def test_failed_add_pattern_keeps_classification(self, detector, monkeypatch):
+        """Test that a pattern that fails to compile leaves severities unchanged."""
+        before = detector.get_patterns()
+        
+        def fail(patterns):
+            raise ValueError("cannot compile")
+        
+        monkeypatch.setattr(detector_module, "compile_matcher", fail)
+        with pytest.raises(ValueError):
+            detector.add_pattern("fatal", Severity.CRITICAL)
+        
+        assert detector.get_patterns() == before
+        errors = detector.detect_in_text("Warning: hot", "test_device")
+        assert [severity for _, severity, _ in errors] == [Severity.WARNING]
+    
+    def test_named_groups_on_re_tier(self, monkeypatch):
+        """Test that group names survive lower-casing for the case-sensitive regex."""
+        lowercase = detector_module._lowercase_pattern
+        assert lowercase(r"(?P<Iface>GE\S+) (?P=Iface) DOWN") == r"(?P<Iface>ge\S+) (?P=Iface) down"
+        assert lowercase(r"(?<=X)Y(?<!Z)") == r"(?<=x)y(?<!z)"
+        
+        for flag in ("HYPERSCAN_AVAILABLE", "AHOCORASICK_AVAILABLE", "RE2_AVAILABLE"):
+            monkeypatch.setattr(detector_module, flag, False)
+        detector = ErrorDetector()
+        detector.add_pattern(r"(?P<word>FATAL) (?P=word)", Severity.CRITICAL)
+        
+        assert detector._matcher.engine == "re"
+        errors = detector.detect_in_text("fatal FATAL", "test_device")
+        assert [(line, severity) for line, severity, _ in errors] == [("fatal FATAL", Severity.CRITICAL)]
+
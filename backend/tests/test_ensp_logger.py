@@ -1,6 +1,12 @@
 """Tests for ENSP packet logger stream cleanup and deduplication."""
+import datetime
 
-from app.services.ensp_logger import ENSPPacketSniffer, INCOMING, OUTGOING, SessionLogger
+import pytest
+
+from app.services.ensp_logger import (
+    ENSPPacketSniffer, INCOMING, OUTGOING, SessionLogger, ethernet_ip_offset,
+    parse_tcp_frame,
+)
 
 
 def _make_sniffer_without_init() -> ENSPPacketSniffer:
@@ -37,8 +43,55 @@ def test_strip_telnet_controls_stateless_no_data_loss(tmp_path):
     assert logger._strip_telnet_controls(key, chunk2) == b"world"
 
 
+def test_strip_telnet_controls_keeps_runs_between_commands(tmp_path):
+    logger = SessionLogger(tmp_path)
+    key = (2000, INCOMING)
+
+    data = b"<R1>\xff\xfb\x01dis\xff\xffplay\xff\xfa\x18\x00xx\xff\xf0 ip\r\n"
+    assert logger._strip_telnet_controls(key, data) == b"<R1>dis\xffplay ip\r\n"
+
+
+def test_strip_telnet_controls_plain_payload_and_split_command(tmp_path):
+    logger = SessionLogger(tmp_path)
+    key = (2000, INCOMING)
+
+    assert logger._strip_telnet_controls(key, b"<R1>\r\n") == b"<R1>\r\n"
+    # A command split across packets still consumes its option byte
+    assert logger._strip_telnet_controls(key, b"ok\xff\xfb") == b"ok"
+    assert logger._strip_telnet_controls(key, b"\x01done") == b"done"
+
+
 def test_apply_backspaces_removes_erased_characters():
     assert SessionLogger._apply_backspaces("abcd\b\bXY") == "abXY"
+    assert SessionLogger._apply_backspaces("ab\x00c\r\n\x7f\x7fd") == "abc\r\nd"
+    assert SessionLogger._apply_backspaces("a\x00b") == "ab"
+
+
+def test_normalize_echo_undoubles_and_collapses():
+    assert SessionLogger._normalize_echo("ddiissppllaayy") == "display"
+    assert SessionLogger._normalize_echo("display  ip") == "display ip"
+    assert SessionLogger._normalize_echo("") == ""
+
+
+def test_format_timestamp_matches_datetime_and_reuses_text(tmp_path):
+    logger = SessionLogger(tmp_path)
+    now_ts = 1768705825.75
+
+    first = logger._format_timestamp(now_ts)
+    assert first == datetime.datetime.fromtimestamp(now_ts).strftime("%Y-%m-%d %H:%M:%S")
+    assert logger._format_timestamp(now_ts + 0.2) is first
+    assert logger._format_timestamp(now_ts + 1) != first
+
+
+def test_detect_device_name_from_prompts_only(tmp_path):
+    logger = SessionLogger(tmp_path)
+
+    logger._detect_device_name(2000, INCOMING, "Interface GE0/0/1 is down")
+    assert 2000 not in logger.device_names
+    logger._detect_device_name(2000, INCOMING, "[Router-1]")
+    assert logger.device_names[2000] == "Router-1"
+    logger._detect_device_name(2001, INCOMING, "R2#")
+    assert logger.device_names[2001] == "R2"
 
 
 def test_exact_dedup_skips_identical_packets():
@@ -68,3 +121,169 @@ def test_exact_dedup_accepts_different_sized_packets():
 
     # Different size at same seq must NOT be treated as duplicate
     assert full_pkt not in seen
+
+
+def test_reassemble_drains_out_of_order_segments_in_seq_order():
+    sniffer = _make_sniffer_without_init()
+    sniffer._streams = {}
+    key = (2000, 50000, 2000, INCOMING)
+
+    assert sniffer._reassemble_payload(key, 100, b"ab") == b"ab"
+    # 104 lies inside the 103 segment and is dropped once that one drains
+    assert sniffer._reassemble_payload(key, 106, b"ghij") == b""
+    assert sniffer._reassemble_payload(key, 103, b"defg") == b""
+    assert sniffer._reassemble_payload(key, 104, b"ef") == b""
+
+    assert sniffer._reassemble_payload(key, 102, b"c") == b"cdefghij"
+    state = sniffer._streams[key]
+    assert state.next_seq == 110
+    assert state.pending == {} and state.pending_seqs == []
+
+
+def test_write_flushes_once_per_packet(tmp_path):
+    class CountingHandle:
+        def __init__(self, handle):
+            self.handle = handle
+            self.flushes = 0
+
+        def write(self, text):
+            self.handle.write(text)
+
+        def flush(self):
+            self.flushes += 1
+            self.handle.flush()
+
+        def close(self):
+            self.handle.close()
+
+    logger = SessionLogger(tmp_path)
+    logger.write(2000, INCOMING, b"<R1>\r\n")
+    handle = logger.handles[2000] = CountingHandle(logger.handles[2000])
+
+    logger.write(2000, INCOMING, b"line one\r\nline two\r\nline three\r\n")
+
+    assert handle.flushes == 1
+    content = logger.files[2000].read_text(encoding="utf-8")
+    assert "line one" in content and "line three" in content
+    logger.close()
+
+
+def test_recent_lines_expire_from_the_front(tmp_path, monkeypatch):
+    logger = SessionLogger(tmp_path)
+    clock = iter([100.0, 100.2, 100.3, 101.0])
+    monkeypatch.setattr("app.services.ensp_logger.time.time", lambda: next(clock))
+
+    for text in ("first", "second", "first", "third"):
+        logger._log_line(2000, INCOMING, text)
+
+    assert list(logger.recent_lines) == [(2000, INCOMING, "third")]
+    path = logger.files[2000]
+    logger.close()
+    assert path.read_text(encoding="utf-8").count("'first'") == 1
+
+
+def test_write_splits_lines_and_keeps_partial_tail(tmp_path):
+    logger = SessionLogger(tmp_path)
+
+    logger.write(2000, OUTGOING, b"display ip\r\ndisplay\rint brief\ndisplay ve")
+
+    content = logger.files[2000].read_text(encoding="utf-8")
+    assert [line.split("] ", 2)[2] for line in content.splitlines()] == [
+        f"{OUTGOING} 'display ip'",
+        f"{OUTGOING} 'display'",
+        f"{OUTGOING} 'int brief'",
+    ]
+    assert logger.input_buffers[2000] == "display ve"
+    logger.close()
+
+
+def test_parse_tcp_frame_matches_scapy_fields():
+    scapy = pytest.importorskip("scapy.all")
+    packet = (
+        scapy.Ether()
+        / scapy.IP(src="10.0.0.1", dst="10.0.0.2")
+        / scapy.TCP(sport=2000, dport=50000, seq=1234, flags="PA")
+        / scapy.Raw(b"<Huawei>display ip\r\n")
+    )
+    # Ethernet padding past the IP total length is not payload
+    frame = bytes(packet) + b"\x00" * 6
+
+    assert parse_tcp_frame(frame, 14) == (
+        "10.0.0.1", "10.0.0.2", 2000, 50000, 0x18, 1234, b"<Huawei>display ip\r\n"
+    )
+    v6 = bytes(scapy.IPv6(src="::1", dst="::1") / scapy.TCP(sport=1, dport=2) / b"x")
+    src, dst, sport, dport, _, _, payload = parse_tcp_frame(v6, 0)
+    assert (src, dst, sport, dport, payload) == ("::1", "::1", 1, 2, b"x")
+    assert parse_tcp_frame(bytes(scapy.IP() / scapy.UDP()), 0) is None
+
+
+def test_parse_tcp_frame_with_offloaded_length():
+    """TSO captures report an IPv4 total length of 0; the payload is the rest of the frame."""
+    scapy = pytest.importorskip("scapy.all")
+    payload = b"display version output\r\n"
+    for length in (0, 20):
+        frame = bytes(
+            scapy.IP(src="127.0.0.1", dst="127.0.0.1", len=length)
+            / scapy.TCP(sport=2000, dport=50000)
+            / scapy.Raw(payload)
+        )
+        assert parse_tcp_frame(frame, 0)[-1] == payload
+    assert parse_tcp_frame(b"\x45", 0) is None
+
+
+def test_on_frame_logs_full_payload_on_skinny_port(tmp_path):
+    """Port 2000 is dissected as Skinny by Scapy; the frame path keeps every byte."""
+    scapy = pytest.importorskip("scapy.all")
+    sniffer = ENSPPacketSniffer({2000}, tmp_path)
+    sniffer.session_logger = SessionLogger(tmp_path)
+    sniffer._link_layer = scapy.Ether
+    frame = bytes(
+        scapy.Ether()
+        / scapy.IP(src="127.0.0.1", dst="127.0.0.1")
+        / scapy.TCP(sport=2000, dport=50000, flags="PA")
+        / scapy.Raw(b"Interface GE0/0/1 is down\r\n")
+    )
+
+    sniffer._on_frame(scapy.conf.raw_layer(frame))
+
+    content = sniffer.session_logger.files[2000].read_text(encoding="utf-8")
+    assert f"{INCOMING} 'Interface GE0/0/1 is down'" in content
+    sniffer.session_logger.close()
+
+
+def test_ethernet_ip_offset_skips_vlan_tags():
+    scapy = pytest.importorskip("scapy.all")
+    ip = scapy.IP() / scapy.TCP()
+
+    assert ethernet_ip_offset(bytes(scapy.Ether() / ip)) == 14
+    assert ethernet_ip_offset(bytes(scapy.Ether() / scapy.Dot1Q(vlan=10) / ip)) == 18
+    qinq = scapy.Ether(type=0x88A8) / scapy.Dot1Q(vlan=100, type=0x8100) / scapy.Dot1Q(vlan=10) / ip
+    assert ethernet_ip_offset(bytes(qinq)) == 22
+    assert ethernet_ip_offset(bytes(scapy.Ether() / scapy.IPv6())) == 14
+    assert ethernet_ip_offset(bytes(scapy.Ether() / scapy.ARP())) is None
+    assert ethernet_ip_offset(b"\x00" * 13) is None
+
+
+def test_on_frame_parses_vlan_tagged_frame_and_defers_non_ip(tmp_path, monkeypatch):
+    scapy = pytest.importorskip("scapy.all")
+    sniffer = ENSPPacketSniffer({2000}, tmp_path)
+    sniffer.session_logger = SessionLogger(tmp_path)
+    sniffer._link_layer = scapy.Ether
+    frame = bytes(
+        scapy.Ether()
+        / scapy.Dot1Q(vlan=10)
+        / scapy.IP(src="127.0.0.1", dst="127.0.0.1")
+        / scapy.TCP(sport=2000, dport=50000, flags="PA")
+        / scapy.Raw(b"<R1>\r\n")
+    )
+
+    sniffer._on_frame(scapy.conf.raw_layer(frame))
+
+    content = sniffer.session_logger.files[2000].read_text(encoding="utf-8")
+    assert f"{INCOMING} '<R1>'" in content
+    sniffer.session_logger.close()
+
+    dissected = []
+    monkeypatch.setattr(sniffer, "_on_packet", dissected.append)
+    sniffer._on_frame(scapy.conf.raw_layer(bytes(scapy.Ether() / scapy.ARP())))
+    assert len(dissected) == 1 and dissected[0].haslayer(scapy.ARP)
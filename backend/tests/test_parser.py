@@ -1,8 +1,8 @@
 """Tests for the log parser."""
 import pytest
 from datetime import datetime
-from app.core.parser import LogParser
-from app.models.error import LogLine
+from app.core.parser import LogParser, parse_timestamp
+from app.models.error import Direction, LogLine
 
 
 class TestLogParser:
@@ -26,6 +26,7 @@ class TestLogParser:
         
         assert result is not None
         assert result.direction == "out"
+        assert result.direction is Direction.OUT
         assert "display version" in result.content
     
     def test_parse_invalid_line(self):
@@ -47,6 +48,11 @@ class TestLogParser:
         assert "\x1b" not in cleaned
         assert "\r" not in cleaned
     
+    def test_clean_content_control_before_escape(self):
+        """Test that a control char right before an escape sequence removes both."""
+        assert LogParser.clean_content("\x07\x1b[0m<R1>\x7f") == "<R1>"
+        assert LogParser.clean_content("\x1b\x01[0m") == "[0m"
+    
     def test_clean_content_preserves_repeated_chars(self):
         """Echo-double removal is handled at write time by SessionLogger, not parser.
         Parser should preserve content as-is to avoid corrupting valid text."""
@@ -55,6 +61,14 @@ class TestLogParser:
         # Parser no longer strips doubles — SessionLogger does it at write time
         assert cleaned == "ddiissppllaayy"
     
+    def test_parse_timestamp_spacing(self):
+        """Test that timestamps with unusual spacing still parse."""
+        expected = datetime(2026, 1, 18, 3, 10, 25)
+        assert parse_timestamp("2026-01-18 03:10:25") == expected
+        assert parse_timestamp("2026-01-18  03:10:25") == expected
+        with pytest.raises(ValueError):
+            parse_timestamp("2026-13-18 03:10:25")
+    
     def test_parse_hyphenated_device_name(self):
         """Test parsing log lines with hyphenated device names like Router-1."""
         raw = "[2026-01-18 03:10:25] [Router-1] ← '<Router-1>'"
@@ -70,19 +84,19 @@ class TestLogParser:
             LogLine(
                 timestamp=datetime(2026, 1, 18, 3, 10, 25),
                 device_id="device_2000",
-                direction="in",
+                direction=Direction.IN,
                 content="same content"
             ),
             LogLine(
                 timestamp=datetime(2026, 1, 18, 3, 10, 25),
                 device_id="device_2000",
-                direction="in",
+                direction=Direction.IN,
                 content="same content"
             ),
             LogLine(
                 timestamp=datetime(2026, 1, 18, 3, 10, 26),
                 device_id="device_2000",
-                direction="in",
+                direction=Direction.IN,
                 content="different content"
             ),
         ]
@@ -91,9 +105,9 @@ class TestLogParser:
         assert len(result) == 2
     
     def test_extract_commands(self):
-        """Test command extraction."""
+        """Test command extraction, including lines built with plain direction strings."""
         lines = [
-            LogLine(timestamp=datetime.now(), device_id="dev", direction="out", content="cmd1"),
+            LogLine(timestamp=datetime.now(), device_id="dev", direction=Direction.OUT, content="cmd1"),
             LogLine(timestamp=datetime.now(), device_id="dev", direction="in", content="response"),
             LogLine(timestamp=datetime.now(), device_id="dev", direction="out", content="cmd2"),
         ]
@@ -1,4 +1,5 @@
 """Tests for the file watcher service, including Windows compatibility."""
+import asyncio
 import os
 import sys
 import time
@@ -13,6 +14,7 @@ import pytest
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from app.core import watcher as watcher_module
 from app.core.watcher import LogFileHandler, LogWatcher, IS_WINDOWS
 
 
@@ -171,6 +173,23 @@ class TestLogWatcherFileModification:
             assert content2 == "Line 2\n"
             assert "Line 1" not in content2
     
+    def test_read_new_content_holds_partial_line(self):
+        """Test that a line still being written is returned once it is complete."""
+        callback = Mock()
+        handler = LogFileHandler(callback)
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log_file = Path(tmpdir) / "test.log"
+            
+            # The writer stops in the middle of a line and of a UTF-8 character
+            arrow = "←".encode("utf-8")
+            log_file.write_bytes(b"Line 1\nLine " + arrow[:1])
+            assert handler._read_new_content(str(log_file)) == "Line 1\n"
+            
+            with open(log_file, 'ab') as f:
+                f.write(arrow[1:] + b" 2\n")
+            assert handler._read_new_content(str(log_file)) == "Line ← 2\n"
+    
     def test_on_modified_triggers_callback(self):
         """Test that on_modified event triggers the callback."""
         callback = Mock()
@@ -256,6 +275,50 @@ class TestLogWatcherIntegration:
             watcher.stop()
 
 
+class TestLogWatcherInotify:
+    """Test cases for the Linux inotify backend."""
+    
+    @pytest.mark.skipif(
+        not (watcher_module.IS_LINUX and watcher_module.INOTIFY_AVAILABLE),
+        reason="inotify_simple on Linux required"
+    )
+    def test_inotify_dispatches_appended_lines(self):
+        """Test that appends are read on the event loop without an observer thread."""
+        received = []
+        
+        async def record(file_path, new_content):
+            received.append((Path(file_path).name, new_content))
+        
+        async def run(tmpdir):
+            log_file = Path(tmpdir) / "device.log"
+            log_file.write_text("Initial line\n")
+            
+            watcher = LogWatcher(Path(tmpdir))
+            watcher.register_async_callback(record)
+            watcher.start()
+            assert watcher._observer is None
+            assert watcher.is_running
+            
+            with open(log_file, 'a') as f:
+                f.write("Error: first\n")
+                f.flush()
+                f.write("Error: second\n")
+            for _ in range(50):
+                if len(received) == 2:
+                    break
+                await asyncio.sleep(0.02)
+            watcher.stop()
+            assert not watcher.is_running
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            asyncio.run(run(tmpdir))
+        
+        assert received == [
+            ("device.log", "Initial line\n"),
+            ("device.log", "Error: first\nError: second\n"),
+        ]
+
+
 class TestLogWatcherPathHandling:
     """Test cases for Windows/Unix path handling."""
     
@@ -278,5 +341,35 @@ class TestLogWatcherPathHandling:
         assert handler._is_log_file("/var/log/ensp/router1") is True
 
 
+class TestLogWatcherAsyncCallbacks:
+    """Test cases for dispatching to async callbacks."""
+    
+    def test_async_callbacks_all_run_despite_failure(self):
+        """Test that async callbacks dispatched from a thread all run and one failure does not stop the rest."""
+        received = []
+        
+        async def record(file_path, new_content):
+            received.append((file_path, new_content))
+        
+        async def fail(file_path, new_content):
+            raise RuntimeError("callback failed")
+        
+        async def run():
+            watcher = LogWatcher()
+            watcher._loop = asyncio.get_running_loop()
+            for callback in (record, fail, record):
+                watcher.register_async_callback(callback)
+            
+            await asyncio.to_thread(watcher._dispatch_callbacks, "R1.log", "Error: x")
+            for _ in range(10):
+                if len(received) == 2:
+                    break
+                await asyncio.sleep(0.01)
+        
+        asyncio.run(run())
+        
+        assert received == [("R1.log", "Error: x"), ("R1.log", "Error: x")]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,77 @@
+"""Tests for the WebSocket connection manager."""
+import asyncio
+import json
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+from app.api.websocket import ConnectionManager
+from app.models.error import DetectedError, ErrorWithSolution, Severity
+
+
+def _make_client(fail: bool = False) -> AsyncMock:
+    client = AsyncMock()
+    if fail:
+        client.send_text.side_effect = RuntimeError("connection closed")
+    return client
+
+
+class TestConnectionManager:
+    """Tests for ConnectionManager broadcasting."""
+
+    def test_broadcast_sends_to_all_clients(self):
+        """Test that every connected client receives the message."""
+        manager = ConnectionManager()
+        clients = [_make_client(), _make_client()]
+
+        async def run():
+            for client in clients:
+                await manager.connect(client)
+            await manager.broadcast({"type": "ping"})
+
+        asyncio.run(run())
+
+        for client in clients:
+            client.send_text.assert_awaited_once()
+            assert json.loads(client.send_text.await_args.args[0]) == {"type": "ping"}
+
+    def test_broadcast_drops_failed_clients(self):
+        """Test that clients whose send fails are removed."""
+        manager = ConnectionManager()
+        good = _make_client()
+        bad = _make_client(fail=True)
+
+        async def run():
+            await manager.connect(good)
+            await manager.connect(bad)
+            await manager.broadcast({"type": "ping"})
+
+        asyncio.run(run())
+
+        assert manager.connection_count == 1
+        good.send_text.assert_awaited_once()
+
+    def test_broadcast_error_payload_shape(self):
+        """Test that error updates keep the fields the dashboard expects."""
+        manager = ConnectionManager()
+        client = _make_client()
+        error = DetectedError(
+            id=7,
+            device_id="R1",
+            timestamp=datetime(2026, 1, 18, 3, 10, 25),
+            error_line="Error: Unrecognized command",
+            context="large context",
+            severity=Severity.CRITICAL,
+        )
+
+        async def run():
+            await manager.connect(client)
+            await manager.broadcast_error(ErrorWithSolution(error=error))
+
+        asyncio.run(run())
+
+        payload = json.loads(client.send_text.await_args.args[0])
+        assert payload["type"] == "error_update"
+        assert payload["data"]["solution"] is None
+        assert payload["data"]["error"]["timestamp"] == "2026-01-18T03:10:25"
+        assert payload["data"]["error"]["severity"] == "critical"
+        assert "context" not in payload["data"]["error"]